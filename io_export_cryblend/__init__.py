@@ -57,9 +57,11 @@ if "bpy" in locals():
     imp.reload(exceptions)
     imp.reload(utils)
     imp.reload(desc)
+    imp.reload(dirty)
 else:
     import bpy
-    from io_export_cryblend import add, export, exceptions, utils, desc
+    from io_export_cryblend import add, export, exceptions, utils, desc, \
+        dirty
 
 from bpy.props import BoolProperty, EnumProperty, FloatVectorProperty, \
     FloatProperty, IntProperty, StringProperty, BoolVectorProperty
@@ -1788,6 +1790,11 @@ class Export(bpy.types.Operator, ExportHelper):
         description="Just exports selected nodes.",
         default=False,
     )
+    export_dirty_nodes = BoolProperty(
+        name="Export Changed Nodes",
+        description="Just exports nodes changed since their last export.",
+        default=False,
+    )
     do_materials = BoolProperty(
         name="Do Materials",
         description="Create MTL files for materials.",
@@ -1813,11 +1820,158 @@ class Export(bpy.types.Operator, ExportHelper):
         description="For use with .chr files. Generally a good idea.",
         default=False,
     )
+    max_influences = IntProperty(
+        name="Max Bone Influences",
+        description="Export only this many of the heaviest bone weights "
+        "of every vertex, e.g. 4 for GPU skinning.",
+        default=8,
+        min=1,
+        max=8,
+    )
+    weight_threshold = FloatProperty(
+        name="Weight Threshold",
+        description="Drop bone weights below this value. The heaviest "
+        "weight of a vertex is always kept.",
+        default=0.0,
+        min=0.0,
+        max=1.0,
+        precision=4,
+    )
+    normalize_weights = BoolProperty(
+        name="Normalize Weights",
+        description="Scale the exported bone weights of every vertex to add "
+        "up to one. The mesh is not changed.",
+        default=False,
+    )
+    quantize_weights = BoolProperty(
+        name="Quantize Weights",
+        description="Round the exported bone weights to 8 bit steps.",
+        default=False,
+    )
     average_planar = BoolProperty(
         name="Average Planar Face Normals",
         description="Align face normals within 1 degree of each other.",
         default=False,
     )
+    export_tangents = BoolProperty(
+        name="Export Tangents",
+        description="Compute tangents and bitangents for the first UV map "
+        "so RC does not have to.",
+        default=False,
+    )
+    weld_attributes = BoolProperty(
+        name="Weld Vertex Attributes",
+        description="Write each distinct normal, UV and color only once.",
+        default=False,
+    )
+    weld_epsilon = FloatProperty(
+        name="Weld Distance",
+        description="Merge attribute values closer than this distance. "
+        "Zero merges exact duplicates only.",
+        default=0.0,
+        min=0.0,
+        precision=6,
+    )
+    position_precision = IntProperty(
+        name="Position Precision",
+        description="Number of decimals written for vertex positions.",
+        default=6,
+        min=1,
+        max=9,
+    )
+    normal_precision = IntProperty(
+        name="Normal Precision",
+        description="Number of decimals written for normals and tangents.",
+        default=6,
+        min=1,
+        max=9,
+    )
+    uv_precision = IntProperty(
+        name="UV Precision",
+        description="Number of decimals written for UV coordinates.",
+        default=6,
+        min=1,
+        max=9,
+    )
+    weight_precision = IntProperty(
+        name="Weight Precision",
+        description="Number of decimals written for skin weights.",
+        default=6,
+        min=1,
+        max=9,
+    )
+    animation_precision = IntProperty(
+        name="Animation Precision",
+        description="Number of decimals written for animation keys.",
+        default=6,
+        min=1,
+        max=9,
+    )
+    trim_zeros = BoolProperty(
+        name="Trim Trailing Zeros",
+        description="Write 1.5 instead of 1.500000 to keep the DAE small.",
+        default=False,
+    )
+    stream_dae = BoolProperty(
+        name="Stream DAE File",
+        description="Write the DAE file while exporting instead of "
+        "building the whole document in memory first.",
+        default=False,
+    )
+    compact_dae = BoolProperty(
+        name="Compact DAE File",
+        description="Leave out extras RC ignores, write node transforms as "
+        "matrices and do not indent the DAE file.",
+        default=False,
+    )
+    deterministic_dae = BoolProperty(
+        name="Deterministic DAE File",
+        description="Write the same DAE file for the same scene and skip RC "
+        "when the DAE file is unchanged.",
+        default=False,
+    )
+    incremental_dae = BoolProperty(
+        name="Incremental DAE File",
+        description="Stream the DAE file and copy unchanged effects, "
+        "geometries, controllers and animations from the previously "
+        "written one. The visual scene is always written anew. Keeps the "
+        "DAE file as Save DAE File does, for the next export to copy from.",
+        default=False,
+    )
+    use_cache = BoolProperty(
+        name="Use Fragment Cache",
+        description="Reuse the DAE text of geometries and animations that "
+        "did not change since an earlier export.",
+        default=False,
+    )
+    cache_directory = StringProperty(
+        name="Cache Directory",
+        description="Where cached fragments are stored. Empty uses a "
+        "directory in the system temp folder.",
+        default="",
+        subtype='DIR_PATH',
+    )
+    cache_size = IntProperty(
+        name="Cache Size (MB)",
+        description="Least recently used fragments are removed when the "
+        "cache grows beyond this size.",
+        default=512,
+        min=1,
+    )
+    parallel_export = BoolProperty(
+        name="Parallel Export",
+        description="Write geometries, controllers and animations in worker "
+        "processes. Where Blender cannot fork, as on Windows, this needs "
+        "Python 3.7 or newer and is ignored before.",
+        default=False,
+    )
+    export_workers = IntProperty(
+        name="Worker Processes",
+        description="Number of worker processes for parallel export. 0 uses "
+        "one per CPU core.",
+        default=0,
+        min=0,
+    )
     export_for_lumberyard = BoolProperty(
         name="Export for LumberYard",
         description="Export for LumberYard engine instead of CryEngine.",
@@ -1857,12 +2011,35 @@ class Export(bpy.types.Operator, ExportHelper):
                 'apply_modifiers',
                 'do_not_merge',
                 'export_selected_nodes',
+                'export_dirty_nodes',
                 'do_materials',
                 'do_textures',
                 'make_chrparams',
                 'make_cdf',
                 'fix_weights',
+                'max_influences',
+                'weight_threshold',
+                'normalize_weights',
+                'quantize_weights',
                 'average_planar',
+                'export_tangents',
+                'weld_attributes',
+                'weld_epsilon',
+                'position_precision',
+                'normal_precision',
+                'uv_precision',
+                'weight_precision',
+                'animation_precision',
+                'trim_zeros',
+                'stream_dae',
+                'compact_dae',
+                'deterministic_dae',
+                'incremental_dae',
+                'use_cache',
+                'cache_directory',
+                'cache_size',
+                'parallel_export',
+                'export_workers',
                 'export_for_lumberyard',
                 'make_layer',
                 'disable_rc',
@@ -1920,6 +2097,7 @@ class Export(bpy.types.Operator, ExportHelper):
         box.prop(self, "apply_modifiers")
         box.prop(self, "do_not_merge")
         box.prop(self, "export_selected_nodes")
+        box.prop(self, "export_dirty_nodes")
 
         box = col.box()
         box.label("Material & Texture", icon="TEXTURE")
@@ -1934,8 +2112,33 @@ class Export(bpy.types.Operator, ExportHelper):
         box = col.box()
         box.label("Corrective", icon="BRUSH_DATA")
         box.prop(self, "fix_weights")
+        box.prop(self, "max_influences")
+        box.prop(self, "weight_threshold")
+        box.prop(self, "normalize_weights")
+        box.prop(self, "quantize_weights")
         box.prop(self, "average_planar")
 
+        box = col.box()
+        box.label("Optimization", icon="MOD_DECIM")
+        box.prop(self, "export_tangents")
+        box.prop(self, "weld_attributes")
+        box.prop(self, "weld_epsilon")
+        box.prop(self, "position_precision")
+        box.prop(self, "normal_precision")
+        box.prop(self, "uv_precision")
+        box.prop(self, "weight_precision")
+        box.prop(self, "animation_precision")
+        box.prop(self, "trim_zeros")
+        box.prop(self, "stream_dae")
+        box.prop(self, "compact_dae")
+        box.prop(self, "deterministic_dae")
+        box.prop(self, "incremental_dae")
+        box.prop(self, "use_cache")
+        box.prop(self, "cache_directory")
+        box.prop(self, "cache_size")
+        box.prop(self, "parallel_export")
+        box.prop(self, "export_workers")
+
         box = col.box()
         box.label("LumberYard", icon="GAME")
         box.prop(self, "export_for_lumberyard")
@@ -2624,6 +2827,7 @@ def register():
     bpy.types.INFO_HT_header.append(draw_item)
     bpy.types.MATERIAL_MT_specials.append(physics_menu)
     bpy.types.MESH_MT_vertex_group_specials.append(remove_unused_vertex_groups)
+    dirty.register()
 
 
 def unregister():
@@ -2643,6 +2847,7 @@ def unregister():
     bpy.types.INFO_HT_header.remove(draw_item)
     bpy.types.MATERIAL_MT_specials.remove(physics_menu)
     bpy.types.MESH_MT_vertex_group_specials.remove(remove_unused_vertex_groups)
+    dirty.unregister()
 
 
 if __name__ == "__main__":
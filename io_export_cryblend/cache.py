@@ -0,0 +1,127 @@
+#------------------------------------------------------------------------------
+# Name:        cache.py
+# Purpose:     On-disk cache of serialized DAE fragments
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+
+from io_export_cryblend.outpipe import cbPrint
+import hashlib
+import os
+import tempfile
+
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), "cryblend_cache")
+EXTENSION = ".xml"
+
+
+class FragmentCache:
+    '''Serialized library elements stored as one file per content key.
+    Reading a fragment refreshes its modification time, and evict removes
+    the least recently used files until the cache fits its size cap.
+    The cache only speeds up the export, so once the directory fails it is
+    disabled with a warning: get misses and put and evict do nothing.
+    '''
+
+    def __init__(self, directory, max_size):
+        self.__directory = directory or DEFAULT_DIRECTORY
+        self.__max_size = max_size
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+        except OSError as error:
+            self.__disable(error)
+
+    def get(self, key):
+        if self.__directory is None:
+            return None
+
+        path = self.__get_path(key)
+        try:
+            with open(path, 'r', encoding="utf-8") as file:
+                fragment = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, UnicodeDecodeError) as error:
+            self.__disable(error)
+            return None
+
+        return fragment
+
+    def put(self, key, fragment):
+        if self.__directory is None:
+            return
+
+        path = self.__get_path(key)
+        temp_path = "{}.{:d}.tmp".format(path, os.getpid())
+        try:
+            with open(temp_path, 'w', encoding="utf-8") as file:
+                file.write(fragment)
+            os.replace(temp_path, path)
+        except OSError as error:
+            self.__disable(error)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def evict(self):
+        if self.__directory is None:
+            return
+
+        entries = []
+        total_size = 0
+        try:
+            names = os.listdir(self.__directory)
+        except OSError as error:
+            self.__disable(error)
+            return
+
+        for name in names:
+            if not name.endswith(EXTENSION):
+                continue
+            path = os.path.join(self.__directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.__max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+    def __disable(self, error):
+        cbPrint("Fragment cache disabled: {}".format(error), 'warning')
+        self.__directory = None
+
+    def __get_path(self, key):
+        return os.path.join(self.__directory, key + EXTENSION)
+
+
+def get_key(*parts):
+    '''Digest of all parts. Bytes are hashed as they are, anything else by
+    its repr, so it must only hold strings, numbers and tuples of those.
+    '''
+    digest = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = repr(part).encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+
+    return digest.hexdigest()
@@ -0,0 +1,321 @@
+#------------------------------------------------------------------------------
+# Name:        daewriter.py
+# Purpose:     In-memory and streaming output of COLLADA documents
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+
+from io_export_cryblend import formatting
+from contextlib import contextmanager
+from io import StringIO
+from xml.dom.minidom import Document, Element, Text
+from xml.sax.saxutils import escape
+import json
+import mmap
+import os
+
+
+INDENT = "    "
+NEWLINE = "\n"
+
+# Owner of the nodes made by the helpers below. Nodes are never appended to
+# it, so it stays empty however many are created.
+__document = Document()
+
+
+def create_element(tag_name, attributes=()):
+    element = __document.createElement(tag_name)
+    for name, value in attributes:
+        element.setAttribute(name, value)
+
+    return element
+
+
+def create_text(text):
+    return __document.createTextNode(text)
+
+
+def write_source(id_, type_, array, params,
+                 precision=formatting.DEFAULT_PRECISION, trim=False):
+    length = len(array)
+    if type_ == "float4x4":
+        stride = 16
+    elif len(params) == 0:
+        stride = 1
+    else:
+        stride = len(params)
+    count = int(length / stride)
+
+    source = create_element("source", (("id", id_),))
+
+    if type_ == "float4x4":
+        array_tag = "float_array"
+    else:
+        array_tag = "{!s}_array".format(type_)
+    source_data = create_element(array_tag, (
+        ("id", "{!s}-array".format(id_)),
+        ("count", str(length))))
+    if type_ in ("float", "float4x4"):
+        text = ArrayText(formatting.iter_floats, array, precision, trim)
+    else:
+        text = create_text(" ".join(array))
+    source_data.appendChild(text)
+    technique_common = create_element("technique_common")
+    accessor = create_element("accessor", (
+        ("source", "#{!s}-array".format(id_)),
+        ("count", str(count)),
+        ("stride", str(stride))))
+    for param in params:
+        accessor.appendChild(create_element(
+            "param", (("name", param), ("type", type_))))
+    if len(params) == 0:
+        accessor.appendChild(create_element("param", (("type", type_),)))
+    technique_common.appendChild(accessor)
+
+    source.appendChild(source_data)
+    source.appendChild(technique_common)
+
+    return source
+
+
+def write_input(name, offset, type_, semantic, set_=0):
+    id_ = "{!s}-{!s}".format(name, type_)
+    input = create_element("input")
+
+    if offset is not None:
+        input.setAttribute("offset", str(offset))
+    input.setAttribute("semantic", semantic)
+    if semantic in ("TEXCOORD", "TEXTANGENT", "TEXBINORMAL"):
+        input.setAttribute("set", str(set_))
+    input.setAttribute("source", "#{!s}".format(id_))
+
+    return input
+
+
+class ArrayText(Text):
+    '''Text node for number arrays which keeps the numbers and formats them
+    in chunks only while the document is written.
+    '''
+
+    def __init__(self, function, *args):
+        Text.__init__(self)
+        self.__function = function
+        self.__args = args
+
+    def __iter__(self):
+        return self.__function(*self.__args)
+
+    def writexml(self, writer, indent="", addindent="", newl=""):
+        writer.write(indent)
+        for chunk in self:
+            writer.write(chunk)
+        writer.write(newl)
+
+    def _get_data(self):
+        return "".join(self)
+
+    def _set_data(self, data):
+        raise AttributeError("ArrayText is read only.")
+
+    data = nodeValue = property(_get_data, _set_data)
+
+    def __len__(self):
+        return len(self.data)
+
+    length = property(__len__)
+
+
+class RawXml(Element):
+    '''Element written from text made by to_fragment, e.g. a cached one.
+    Its lines are only moved to the indentation of their new parent.
+    '''
+
+    def __init__(self, tag_name, fragment):
+        Element.__init__(self, tag_name)
+        self.__fragment = fragment
+
+    def writexml(self, writer, indent="", addindent="", newl=""):
+        if not indent:
+            writer.write(self.__fragment)
+            return
+
+        for line in self.__fragment.splitlines(True):
+            writer.write(indent)
+            writer.write(line)
+
+
+def to_fragment(element, pretty=True):
+    '''Serialize an element as if it were written at the document root.'''
+    text = StringIO()
+    if pretty:
+        element.writexml(text, "", INDENT, NEWLINE)
+    else:
+        element.writexml(text)
+
+    return text.getvalue()
+
+
+class DomWriter:
+    '''Collects the elements in a document that is written as a whole
+    later on.
+    '''
+
+    def __init__(self, document):
+        self.__stack = [document]
+
+    def append(self, element, key=None):
+        self.__stack[-1].appendChild(element)
+
+    def can_splice(self, key):
+        return False
+
+    def splice(self, key):
+        return False
+
+    @contextmanager
+    def element(self, element):
+        self.append(element)
+        self.__stack.append(element)
+        try:
+            yield element
+        finally:
+            self.__stack.pop()
+
+    def close(self):
+        pass
+
+
+class StreamWriter:
+    '''Writes every appended element straight to the file and drops it, so
+    only the element in progress is held in memory. The output matches
+    toprettyxml, or toxml if not pretty, of the same document.
+
+    Elements appended with a key are indexed by their byte range. Given
+    the PreviousDae of the last export, splice copies an element with an
+    unchanged key from there instead of writing it again.
+    '''
+
+    def __init__(self, filepath, pretty=True, previous=None):
+        self.__indent = INDENT if pretty else ""
+        self.__newline = NEWLINE if pretty else ""
+        self.__previous = previous
+        self.__index = {}
+        self.__file = open(filepath, "wb")
+        self.write('<?xml version="1.0" ?>{}'.format(self.__newline))
+        self.__depth = 0
+
+    def write(self, text):
+        self.__file.write(text.encode("utf-8"))
+
+    def append(self, element, key=None):
+        start = self.__file.tell()
+        element.writexml(self, self.__indent * self.__depth,
+                         self.__indent, self.__newline)
+        element.unlink()
+        if key is not None:
+            self.__index[key] = (start, self.__file.tell())
+
+    def can_splice(self, key):
+        return self.__previous is not None and key in self.__previous
+
+    def splice(self, key):
+        if self.__previous is None:
+            return False
+
+        data = self.__previous.get(key)
+        if data is None:
+            return False
+
+        start = self.__file.tell()
+        self.__file.write(data)
+        self.__index[key] = (start, self.__file.tell())
+        return True
+
+    @contextmanager
+    def element(self, element):
+        indent = self.__indent * self.__depth
+        attributes = "".join(
+            ' {}={}'.format(name, self.__quote(value))
+            for name, value in element.attributes.items())
+        self.write("{}<{}{}>{}".format(
+            indent, element.tagName, attributes, self.__newline))
+
+        self.__depth += 1
+        try:
+            yield element
+        finally:
+            self.__depth -= 1
+            self.write("{}</{}>{}".format(
+                indent, element.tagName, self.__newline))
+
+    def close(self):
+        self.__file.close()
+        if self.__previous is not None:
+            self.__previous.close()
+
+    def save_index(self, filepath):
+        '''Store the index next to filepath, the final DAE file, which must
+        already be in place.'''
+        stat = os.stat(filepath)
+        index = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "elements": self.__index,
+        }
+        with open(get_index_path(filepath), "w") as file:
+            json.dump(index, file)
+
+    def __quote(self, value):
+        return '"{}"'.format(escape(value, {'"': "&quot;"}))
+
+
+class PreviousDae:
+    '''Memory map of the last written DAE file and its element index.'''
+
+    def __init__(self, file, elements):
+        self.__file = file
+        self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__elements = elements
+
+    def __contains__(self, key):
+        return key in self.__elements
+
+    def get(self, key):
+        span = self.__elements.get(key)
+        if span is None:
+            return None
+
+        start, end = span
+        return self.__map[start:end]
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
+
+
+def load_previous(filepath):
+    '''PreviousDae for filepath, or None if the file or its index is missing
+    or the file changed after the index was written.'''
+    try:
+        with open(get_index_path(filepath), "r") as file:
+            index = json.load(file)
+        stat = os.stat(filepath)
+    except (OSError, ValueError):
+        return None
+
+    if index.get("size") != stat.st_size or \
+            index.get("mtime") != stat.st_mtime or not stat.st_size:
+        return None
+
+    return PreviousDae(open(filepath, "rb"), index.get("elements", {}))
+
+
+def get_index_path(filepath):
+    return "{}.idx".format(filepath)
@@ -0,0 +1,233 @@
+#------------------------------------------------------------------------------
+# Name:        dirty.py
+# Purpose:     Tracks which export nodes changed since their last export
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+
+if "bpy" in locals():
+    import imp
+    imp.reload(utils)
+else:
+    import bpy
+    from io_export_cryblend import utils
+
+from bpy.app.handlers import persistent
+from collections import deque
+from contextlib import contextmanager
+
+
+# The export itself changes the scene (active object, modes, frames), so
+# updates are ignored while it runs. Blender may still send some of them
+# right after, those are ignored for the IDs of the exported nodes only.
+__ignore = {'running': 0, 'ids': set()}
+
+# Token of the last export of every node, dropped when the node changes.
+__exports = {}
+# RC runs in a thread, which queues the token of its export once the
+# conversion succeeded. bpy is not thread safe, so the flags are cleared
+# later on the main thread.
+__converted = deque()
+
+
+@contextmanager
+def ignore_updates(groups):
+    '''Ignore the scene updates made while exporting groups.'''
+    __ignore['running'] += 1
+    try:
+        yield
+    finally:
+        try:
+            __flush_updates()
+        finally:
+            __ignore['running'] -= 1
+
+        __ignore['ids'] = __get_ids_used_by(groups)
+        timers = getattr(bpy.app, "timers", None)
+        if timers is not None:
+            # Updates of the export come before the next event loop
+            # iteration, edits of the user after it.
+            timers.register(__forget_export, first_interval=0)
+
+
+def begin_export(groups):
+    '''Token for mark_converted, which clears the flags of groups unless
+    they change in the meantime.'''
+    token = object()
+    for group in groups:
+        __exports[group.name] = token
+
+    return token
+
+
+def mark_converted(token):
+    '''Called from any thread once the export of token was converted.'''
+    __converted.append(token)
+
+
+def mark_dirty(scene, groups):
+    states = __get_states(scene)
+    for group in groups:
+        __exports.pop(group.name, None)
+        # Only write on a change, as this runs on every scene update.
+        if states.get(group.name, 1) == 0:
+            states[group.name] = 1
+
+
+@persistent
+def on_scene_update(scene, depsgraph=None):
+    if __ignore['running']:
+        return
+
+    __clear_converted()
+    ignored = __ignore['ids']
+    if depsgraph is not None:
+        ids = [update.id.original for update in depsgraph.updates]
+    else:
+        ids = __get_updated_ids()
+        # scene_update_post runs on every iteration of the event loop, so
+        # only its first call after the export can carry export updates.
+        __forget_export()
+
+    if ignored:
+        ids = [id_ for id_ in ids if id_.as_pointer() not in ignored]
+
+    if ids:
+        mark_dirty(scene, __get_groups_using(ids))
+
+
+def __get_states(scene):
+    if utils.DIRTY_NODES not in scene:
+        scene[utils.DIRTY_NODES] = {}
+
+    return scene[utils.DIRTY_NODES]
+
+
+def __clear_converted():
+    if not __converted:
+        return
+
+    states = __get_states(bpy.context.scene)
+    while __converted:
+        token = __converted.popleft()
+        for name, export in list(__exports.items()):
+            if export is token:
+                states[name] = 0
+                del __exports[name]
+
+
+def __poll_converted():
+    __clear_converted()
+    return 1.0
+
+
+def __flush_updates():
+    '''Evaluate pending updates, which calls on_scene_update now.'''
+    view_layer = getattr(bpy.context, "view_layer", None)
+    if view_layer is not None:
+        view_layer.update()
+    else:
+        bpy.context.scene.update()
+
+
+def __forget_export():
+    __ignore['ids'] = set()
+
+
+def __get_ids_used_by(groups):
+    '''Pointers of the IDs __uses checks for the objects of groups.'''
+    ids = set()
+    for group in groups:
+        for object_ in group.objects:
+            objects = [object_]
+            if object_.parent is not None and \
+                    object_.parent.type == 'ARMATURE':
+                objects.append(object_.parent)
+
+            for item in objects:
+                ids.add(item)
+                ids.add(item.data)
+                if item.animation_data is not None:
+                    ids.add(item.animation_data.action)
+                ids.update(slot.material for slot in item.material_slots)
+
+    return {id_.as_pointer() for id_ in ids if id_ is not None}
+
+
+def __get_updated_ids():
+    ids = []
+    for collection in (bpy.data.objects, bpy.data.meshes,
+                       bpy.data.materials, bpy.data.actions):
+        if collection.is_updated:
+            ids.extend(id_ for id_ in collection
+                       if id_.is_updated or getattr(
+                           id_, "is_updated_data", False))
+
+    return ids
+
+
+def __get_groups_using(ids):
+    ids = set(ids)
+    groups = []
+    for group in utils.get_export_nodes():
+        for object_ in group.objects:
+            if __uses(object_, ids) or (
+                    object_.parent is not None and
+                    object_.parent.type == 'ARMATURE' and
+                    __uses(object_.parent, ids)):
+                groups.append(group)
+                break
+
+    return groups
+
+
+def __uses(object_, ids):
+    if object_ in ids or object_.data in ids:
+        return True
+
+    animation_data = object_.animation_data
+    if animation_data is not None and animation_data.action in ids:
+        return True
+
+    for slot in object_.material_slots:
+        if slot.material in ids:
+            return True
+
+    return False
+
+
+def __get_handlers():
+    handlers = bpy.app.handlers
+    if hasattr(handlers, "depsgraph_update_post"):
+        return handlers.depsgraph_update_post
+
+    return handlers.scene_update_post
+
+
+def register():
+    handlers = __get_handlers()
+    if on_scene_update not in handlers:
+        handlers.append(on_scene_update)
+
+    # depsgraph_update_post only runs on changes, a timer picks up the
+    # conversions finished in between.
+    timers = getattr(bpy.app, "timers", None)
+    if timers is not None and not timers.is_registered(__poll_converted):
+        timers.register(__poll_converted, persistent=True)
+
+
+def unregister():
+    handlers = __get_handlers()
+    if on_scene_update in handlers:
+        handlers.remove(on_scene_update)
+
+    timers = getattr(bpy.app, "timers", None)
+    if timers is not None and timers.is_registered(__poll_converted):
+        timers.unregister(__poll_converted)
@@ -0,0 +1,615 @@
+#------------------------------------------------------------------------------
+# Name:        elements.py
+# Purpose:     COLLADA library elements written from ir.py records
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+'''Writers of the library elements and the visual scene. They only read
+ir.py records and the export config, never bpy.
+'''
+
+
+from io_export_cryblend import formatting, meshdata, skeleton
+from io_export_cryblend.daewriter import ArrayText, create_element, \
+    create_text, write_input, write_source
+from io_export_cryblend.outpipe import cbPrint
+from collections import OrderedDict
+from time import perf_counter as clock
+import math
+import numpy
+
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0,
+            0.0, 0.0, 0.0, 1.0)
+
+
+#------------------------------------------------------------------------------
+# Effects and Materials:
+#------------------------------------------------------------------------------
+
+def write_effect(material, config):
+    effect_node = create_element(
+        "effect", (("id", "{}_fx".format(material.name)),))
+    profile_node = create_element("profile_COMMON")
+    for image in material.images:
+        if image is not None:
+            surface, sampler = __create_surface_and_sampler(image)
+            profile_node.appendChild(surface)
+            profile_node.appendChild(sampler)
+    technique_common = create_element("technique", (("sid", "common"),))
+
+    phong = __create_phong_node(material)
+    technique_common.appendChild(phong)
+    profile_node.appendChild(technique_common)
+
+    if not config.compact_dae:
+        extra = write_double_sided_extra("GOOGLEEARTH")
+        profile_node.appendChild(extra)
+    effect_node.appendChild(profile_node)
+
+    if not config.compact_dae:
+        extra = write_double_sided_extra("MAX3D")
+        effect_node.appendChild(extra)
+
+    return effect_node
+
+
+def write_material(material):
+    material_element = create_element("material", (("id", material.name),))
+    instance_effect = create_element(
+        "instance_effect", (("url", "#{}_fx".format(material.name)),))
+    material_element.appendChild(instance_effect)
+
+    return material_element
+
+
+def write_double_sided_extra(profile):
+    extra = create_element("extra")
+    technique = create_element("technique", (("profile", profile),))
+    double_sided = create_element("double_sided")
+    double_sided.appendChild(create_text("1"))
+    technique.appendChild(double_sided)
+    extra.appendChild(technique)
+
+    return extra
+
+
+def __create_surface_and_sampler(image_name):
+    surface = create_element(
+        "newparam", (("sid", "{}-surface".format(image_name)),))
+    surface_node = create_element("surface", (("type", "2D"),))
+    init_from_node = create_element("init_from")
+    init_from_node.appendChild(create_text(image_name))
+    surface_node.appendChild(init_from_node)
+    surface.appendChild(surface_node)
+    sampler = create_element(
+        "newparam", (("sid", "{}-sampler".format(image_name)),))
+    sampler_node = create_element("sampler2D")
+    source_node = create_element("source")
+    source_node.appendChild(create_text("{}-surface".format(image_name)))
+    sampler_node.appendChild(source_node)
+    sampler.appendChild(sampler_node)
+
+    return surface, sampler
+
+
+def __create_phong_node(material):
+    phong = create_element("phong")
+    diffuse_image, specular_image, normal_image = material.images
+
+    phong.appendChild(__create_color_node(material.emission, "emission"))
+    phong.appendChild(__create_color_node(material.ambient, "ambient"))
+    if diffuse_image is not None:
+        phong.appendChild(__create_texture_node(diffuse_image, "diffuse"))
+    else:
+        phong.appendChild(__create_color_node(material.diffuse, "diffuse"))
+    if specular_image is not None:
+        phong.appendChild(__create_texture_node(specular_image, "specular"))
+    else:
+        phong.appendChild(__create_color_node(material.specular, "specular"))
+    phong.appendChild(
+        __create_attribute_node(material.shininess, "shininess"))
+    phong.appendChild(__create_attribute_node(
+        material.index_refraction, "index_refraction"))
+    if normal_image is not None:
+        phong.appendChild(__create_texture_node(normal_image, "normal"))
+
+    return phong
+
+
+def __create_color_node(color, type_):
+    node = create_element(type_)
+    color_node = create_element("color", (("sid", type_),))
+    color_node.appendChild(
+        create_text("{:f} {:f} {:f} {:f}".format(*color)))
+    node.appendChild(color_node)
+
+    return node
+
+
+def __create_texture_node(image_name, type_):
+    node = create_element(type_)
+    texture = create_element(
+        "texture", (("texture", "{}-sampler".format(image_name)),))
+    node.appendChild(texture)
+
+    return node
+
+
+def __create_attribute_node(value, type_):
+    node = create_element(type_)
+    float_node = create_element("float", (("sid", type_),))
+    float_node.appendChild(create_text(str(value)))
+    node.appendChild(float_node)
+
+    return node
+
+
+#------------------------------------------------------------------------------
+# Geometries:
+#------------------------------------------------------------------------------
+
+def write_geometry(geometry, config):
+    buffers = geometry.buffers
+    id_ = geometry.id
+
+    geometry_node = create_element("geometry", (("id", id_),))
+    mesh_node = create_element("mesh")
+
+    start_time = clock()
+    __write_positions(id_, buffers, mesh_node, config)
+    cbPrint('Positions took {:.4f} sec.'.format(clock() - start_time))
+
+    inputs = [('vertices', 'VERTEX', 0, buffers.corner_vertices)]
+
+    start_time = clock()
+    inputs.extend(__write_normals(id_, buffers, mesh_node, config))
+    cbPrint('Normals took {:.4f} sec.'.format(clock() - start_time))
+
+    start_time = clock()
+    inputs.extend(__write_uvs(id_, buffers, mesh_node, config))
+    cbPrint('UVs took {:.4f} sec.'.format(clock() - start_time))
+
+    start_time = clock()
+    color_indices = __write_vertex_colors(id_, buffers, mesh_node, config)
+    if color_indices is not None:
+        inputs.append(('colors', 'COLOR', 0, color_indices))
+    cbPrint(
+        'Vertex colors took {:.4f} sec.'.format(
+            clock() - start_time))
+
+    start_time = clock()
+    __write_vertices(id_, mesh_node)
+    cbPrint('Vertices took {:.4f} sec.'.format(clock() - start_time))
+
+    start_time = clock()
+    __write_polylist(geometry, mesh_node, inputs)
+    cbPrint('Polylist took {:.4f} sec.'.format(clock() - start_time))
+
+    if not config.compact_dae:
+        extra = write_double_sided_extra("MAYA")
+        mesh_node.appendChild(extra)
+    geometry_node.appendChild(mesh_node)
+
+    return geometry_node
+
+
+def __weld(values, size, config):
+    if config.weld_attributes:
+        return meshdata.weld(values, size, config.weld_epsilon)
+
+    return values, numpy.arange(len(values) // size)
+
+
+def __write_float_source(id_, array, params, precision, config):
+    return write_source(id_, "float", array, params, precision,
+                        config.trim_zeros)
+
+
+def __write_positions(name, buffers, root, config):
+    id_ = "{!s}-positions".format(name)
+    source = __write_float_source(
+        id_, buffers.positions, "XYZ", config.position_precision, config)
+    root.appendChild(source)
+
+
+def __write_normals(name, buffers, root, config):
+    polygon_normals = buffers.polygon_normals.reshape(-1, 3)
+    if config.average_planar:
+        polygon_normals = meshdata.average_planar_normals(
+            polygon_normals, ~buffers.polygon_smooth)
+
+    float_normals, normal_indices = buffers.get_normals(polygon_normals)
+
+    if config.export_tangents:
+        if buffers.tangents is not None:
+            return __write_tangent_space(
+                name, buffers, root, float_normals, normal_indices, config)
+        cbPrint("Could not compute tangents for {}.".format(name),
+                'warning')
+
+    float_normals, welded_indices = __weld(float_normals, 3, config)
+
+    id_ = "{!s}-normals".format(name)
+    source = __write_float_source(
+        id_, float_normals, "XYZ", config.normal_precision, config)
+    root.appendChild(source)
+
+    indices = welded_indices[normal_indices[buffers.corner_loops]]
+    return [('normals', 'NORMAL', 0, indices)]
+
+
+def __write_tangent_space(name, buffers, root, float_normals, normal_indices,
+                          config):
+    normals = float_normals.reshape(-1, 3)[normal_indices]
+    frames = numpy.column_stack((normals,
+                                 buffers.tangents.reshape(-1, 3),
+                                 buffers.bitangents.reshape(-1, 3)))
+
+    # Normal, tangent and bitangent share one index, so identical
+    # frames are always merged, not only when welding is enabled.
+    epsilon = 0.0
+    if config.weld_attributes:
+        epsilon = config.weld_epsilon
+    frames, frame_indices = meshdata.weld(frames.ravel(), 9, epsilon)
+    frames = frames.reshape(-1, 9)
+    indices = frame_indices[buffers.corner_loops]
+
+    inputs = []
+    for column, type_, semantic in ((0, 'normals', 'NORMAL'),
+                                    (3, 'tangents', 'TEXTANGENT'),
+                                    (6, 'bitangents', 'TEXBINORMAL')):
+        id_ = "{!s}-{!s}".format(name, type_)
+        source = __write_float_source(
+            id_, frames[:, column:column + 3].ravel(), "XYZ",
+            config.normal_precision, config)
+        root.appendChild(source)
+        inputs.append((type_, semantic, 0, indices))
+
+    return inputs
+
+
+def __write_uvs(name, buffers, root, config):
+    if not buffers.uv_layers:
+        cbPrint("Your UV map is missing.", 'warning')
+    else:
+        cbPrint("Found UV map.")
+
+    uv_layers = [uvs for layer_name, uvs in buffers.uv_layers] or [
+        numpy.zeros(buffers.loop_count * 2, numpy.float32)]
+
+    inputs = []
+    for set_, float_uvs in enumerate(uv_layers):
+        float_uvs, uv_indices = __weld(float_uvs, 2, config)
+
+        type_ = "UVMap-{:d}".format(set_)
+        id_ = "{!s}-{!s}".format(name, type_)
+        source = __write_float_source(
+            id_, float_uvs, "ST", config.uv_precision, config)
+        root.appendChild(source)
+
+        inputs.append((type_, 'TEXCOORD', set_,
+                       uv_indices[buffers.corner_loops]))
+
+    return inputs
+
+
+def __write_vertex_colors(name, buffers, root, config):
+    colors = buffers.get_colors()
+    if colors is None:
+        return
+
+    float_colors, params = colors
+    float_colors, color_indices = __weld(float_colors, len(params), config)
+
+    id_ = "{!s}-colors".format(name)
+    source = __write_float_source(
+        id_, float_colors, params, formatting.DEFAULT_PRECISION, config)
+    root.appendChild(source)
+
+    return color_indices[buffers.corner_loops]
+
+
+def __write_vertices(name, root):
+    vertices = create_element(
+        "vertices", (("id", "{}-vertices".format(name)),))
+    input = write_input(name, None, "positions", "POSITION")
+    vertices.appendChild(input)
+    root.appendChild(vertices)
+
+
+def __write_polylist(geometry, root, inputs):
+    # Inputs sharing an index array share its offset.
+    streams = []
+    offsets = []
+    for type_, semantic, set_, indices in inputs:
+        for offset, stream in enumerate(streams):
+            if stream is indices:
+                break
+        else:
+            offset = len(streams)
+            streams.append(indices)
+        offsets.append(offset)
+
+    corner_data = numpy.column_stack(streams)
+
+    materialnames = geometry.material_names
+
+    for matindex, face_sizes, corners in geometry.buffers.group_by_material():
+        if matindex >= len(materialnames):
+            continue
+
+        polylist = create_element('polylist', (
+            ('material', materialnames[matindex]),
+            ('count', str(len(face_sizes)))))
+
+        for offset, (type_, semantic, set_, indices) in zip(
+                offsets, inputs):
+            input = write_input(geometry.id, offset, type_, semantic, set_)
+            polylist.appendChild(input)
+
+        vcount = create_element('vcount')
+        vcount.appendChild(ArrayText(formatting.iter_ints, face_sizes))
+
+        p = create_element('p')
+        p.appendChild(ArrayText(
+            formatting.iter_ints, corner_data[corners].ravel()))
+
+        polylist.appendChild(vcount)
+        polylist.appendChild(p)
+        root.appendChild(polylist)
+
+
+#------------------------------------------------------------------------------
+# Controllers:
+#------------------------------------------------------------------------------
+
+def write_skin(skin, config):
+    controller_node = create_element("controller", (("id", skin.id),))
+
+    skin_node = create_element(
+        "skin", (("source", "#{}".format(skin.geometry_id)),))
+    controller_node.appendChild(skin_node)
+
+    bind_shape_matrix = create_element("bind_shape_matrix")
+    bind_shape_matrix.appendChild(
+        create_text(formatting.format_floats(IDENTITY)))
+    skin_node.appendChild(bind_shape_matrix)
+
+    id_ = "{!s}-joints".format(skin.id)
+    source = write_source(id_, "IDREF", skin.joint_names, [])
+    skin_node.appendChild(source)
+
+    id_ = "{!s}-matrices".format(skin.id)
+    source = write_source(id_, "float4x4", skin.bind_matrices, [])
+    skin_node.appendChild(source)
+
+    id_ = "{!s}-weights".format(skin.id)
+    source = __write_float_source(
+        id_, skin.weights, [], config.weight_precision, config)
+    skin_node.appendChild(source)
+
+    vertex_weights = create_element(
+        "vertex_weights", (("count", str(len(skin.influence_counts))),))
+
+    input = write_input(skin.id, 0, "joints", "JOINT")
+    vertex_weights.appendChild(input)
+    input = write_input(skin.id, 1, "weights", "WEIGHT")
+    vertex_weights.appendChild(input)
+
+    vcount = create_element("vcount")
+    vcount.appendChild(ArrayText(formatting.iter_ints, skin.influence_counts))
+    vertex_weights.appendChild(vcount)
+
+    # Every influence refers to its joint and to its own weight.
+    pairs = numpy.column_stack((skin.joints, numpy.arange(len(skin.joints))))
+    v = create_element("v")
+    v.appendChild(ArrayText(formatting.iter_ints, pairs.ravel()))
+    vertex_weights.appendChild(v)
+
+    skin_node.appendChild(vertex_weights)
+
+    joints = create_element("joints")
+    input = write_input(skin.id, None, "joints", "JOINT")
+    joints.appendChild(input)
+    input = write_input(skin.id, None, "matrices", "INV_BIND_MATRIX")
+    joints.appendChild(input)
+    skin_node.appendChild(joints)
+
+    return controller_node
+
+
+#------------------------------------------------------------------------------
+# Animations:
+#------------------------------------------------------------------------------
+
+def write_animation(animation, config):
+    keys, handles_left, handles_right = (
+        array.reshape(-1, 2).astype(numpy.float64)
+        for array in (animation.keys, animation.handles_left,
+                      animation.handles_right))
+
+    def frame_to_time(frames):
+        return animation.fps_base * frames / animation.fps
+
+    sources = OrderedDict((
+        ("input", frame_to_time(keys[:, 0])),
+        ("output", keys[:, 1] * animation.multiplier),
+        ("interpolation", animation.interpolations),
+        ("intangent", numpy.column_stack((
+            frame_to_time(handles_left[:, 0]),
+            handles_left[:, 1])).ravel()),
+        ("outangent", numpy.column_stack((
+            frame_to_time(handles_right[:, 0]),
+            handles_right[:, 1])).ravel()),
+    ))
+
+    id_prefix = animation.id
+    source_prefix = "#{!s}".format(id_prefix)
+
+    animation_element = create_element("animation", (("id", id_prefix),))
+
+    for type_, data in sources.items():
+        anim_node = __create_animation_node(type_, data, id_prefix, config)
+        animation_element.appendChild(anim_node)
+
+    sampler = __create_sampler(id_prefix, source_prefix)
+    channel = create_element("channel", (
+        ("source", "{!s}-sampler".format(source_prefix)),
+        ("target", animation.target)))
+
+    animation_element.appendChild(sampler)
+    animation_element.appendChild(channel)
+
+    return animation_element
+
+
+def __create_animation_node(type_, data, id_prefix, config):
+    id_ = "{!s}-{!s}".format(id_prefix, type_)
+    type_map = {
+        "input": ["float", ["TIME"]],
+        "output": ["float", ["VALUE"]],
+        "intangent": ["float", "XY"],
+        "outangent": ["float", "XY"],
+        "interpolation": ["name", ["INTERPOLATION"]]
+    }
+
+    source = write_source(
+        id_, type_map[type_][0], data, type_map[type_][1],
+        config.animation_precision, config.trim_zeros)
+
+    return source
+
+
+def __create_sampler(id_prefix, source_prefix):
+    sampler = create_element(
+        "sampler", (("id", "{!s}-sampler".format(id_prefix)),))
+
+    for semantic, type_ in (("INPUT", "input"),
+                            ("OUTPUT", "output"),
+                            ("INTERPOLATION", "interpolation"),
+                            ("IN_TANGENT", "intangent"),
+                            ("OUT_TANGENT", "outangent")):
+        sampler.appendChild(create_element("input", (
+            ("semantic", semantic),
+            ("source", "{!s}-{!s}".format(source_prefix, type_)))))
+
+    return sampler
+
+
+#------------------------------------------------------------------------------
+# Visual Scene:
+#------------------------------------------------------------------------------
+
+def write_node(node, config):
+    node_element = create_element("node", node.attributes)
+    __write_transform(node, node_element, config)
+
+    if node.instance is not None:
+        node_element.appendChild(__write_instance(node.instance))
+    # The schema puts the extra after the child nodes.
+    for child in node.children:
+        node_element.appendChild(write_node(child, config))
+    if node.extra is not None:
+        node_element.appendChild(__write_extra(node.extra))
+
+    return node_element
+
+
+def __write_transform(node, node_element, config):
+    # Animation channels target the translate and rotate sids, so
+    # animated nodes keep them even in the compact profile.
+    if config.compact_dae and not node.animated:
+        node_element.appendChild(__create_matrix_node(node, config))
+        return
+
+    translate = create_element("translate", (("sid", "translation"),))
+    translate.appendChild(create_text(
+        "{:f} {:f} {:f}".format(*node.location)))
+    node_element.appendChild(translate)
+
+    for index, axis in enumerate("XYZ"):
+        rotate = create_element(
+            "rotate", (("sid", "rotation_{}".format(axis)),))
+        vector = ["0", "0", "0"]
+        vector[index] = "1"
+        rotate.appendChild(create_text("{} {:f}".format(
+            " ".join(vector), math.degrees(node.rotation[index]))))
+        node_element.appendChild(rotate)
+
+    scale = create_element("scale", (("sid", "scale"),))
+    scale.appendChild(create_text(" ".join(
+        "{!s}".format(value) for value in node.scale)))
+    node_element.appendChild(scale)
+
+
+def __create_matrix_node(node, config):
+    # The rotate elements apply Z first, so X is the outermost rotation.
+    rotation = skeleton.euler_matrices(numpy.array([node.rotation]), "ZYX")
+    matrix = numpy.identity(4)
+    matrix[:3, :3] = rotation[0] * node.scale
+    matrix[:3, 3] = node.location
+
+    matrix_node = create_element("matrix", (("sid", "transform"),))
+    matrix_node.appendChild(create_text(formatting.format_floats(
+        matrix.ravel(), config.position_precision, config.trim_zeros)))
+
+    return matrix_node
+
+
+def __write_instance(instance):
+    instance_element = create_element(
+        instance.tag_name, (("url", instance.url),))
+    bind_material = create_element("bind_material")
+    technique_common = create_element("technique_common")
+
+    for material_name in instance.material_names:
+        instance_material = create_element("instance_material", (
+            ("symbol", material_name),
+            ("target", "#{!s}".format(material_name))))
+        instance_material.appendChild(create_element("bind_vertex_input", (
+            ("semantic", "UVMap"),
+            ("input_semantic", "TEXCOORD"),
+            ("input_set", "0"))))
+        technique_common.appendChild(instance_material)
+
+    bind_material.appendChild(technique_common)
+    instance_element.appendChild(bind_material)
+
+    return instance_element
+
+
+def __write_extra(extra):
+    extra_element = create_element("extra")
+    technique = create_element("technique", (("profile", "CryEngine"),))
+    properties = create_element("properties")
+    for property_ in extra.properties:
+        properties.appendChild(create_text(property_))
+    technique.appendChild(properties)
+
+    if extra.helper is not None:
+        technique.appendChild(__create_helper(extra.helper))
+
+    extra_element.appendChild(technique)
+
+    return extra_element
+
+
+def __create_helper(bounding_box):
+    helper = create_element("helper", (("type", "dummy"),))
+    for tag_name, corner in (("bound_box_min", bounding_box[:3]),
+                             ("bound_box_max", bounding_box[3:])):
+        element = create_element(tag_name)
+        element.appendChild(create_text("{:f} {:f} {:f}".format(*corner)))
+        helper.appendChild(element)
+
+    return helper
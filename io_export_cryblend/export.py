@@ -17,29 +17,58 @@ if "bpy" in locals():
     import imp
     imp.reload(utils)
     imp.reload(exceptions)
+    imp.reload(meshdata)
+    imp.reload(formatting)
+    imp.reload(daewriter)
+    imp.reload(cache)
+    imp.reload(dirty)
+    imp.reload(ir)
+    imp.reload(skeleton)
+    imp.reload(elements)
+    imp.reload(workers)
 else:
     import bpy
-    from io_export_cryblend import utils, add, exceptions
+    from io_export_cryblend import utils, add, exceptions, meshdata, \
+        formatting, daewriter, cache, dirty, ir, elements, workers, skeleton
 
 from io_export_cryblend.rc import RCInstance
 from io_export_cryblend.outpipe import cbPrint
 from io_export_cryblend.utils import join
 
-from bpy_extras.io_utils import ExportHelper
-from collections import OrderedDict
+from collections import OrderedDict, deque
 from datetime import datetime
-from mathutils import Matrix, Vector
-from time import clock
-from xml.dom.minidom import Document, Element, parse, parseString
-import bmesh
-import copy
+from time import perf_counter as clock
+from xml.dom.minidom import Document
+import numpy
 import os
-import threading
-import subprocess
-import time
-import xml.dom.minidom
 
 
+# Config attributes that change the text of a cached fragment.
+GEOMETRY_OPTIONS = (
+    'average_planar',
+    'export_tangents',
+    'weld_attributes',
+    'weld_epsilon',
+    'position_precision',
+    'normal_precision',
+    'uv_precision',
+    'trim_zeros',
+    'compact_dae',
+)
+SKIN_OPTIONS = (
+    'weight_precision',
+    'trim_zeros',
+    'compact_dae',
+)
+ANIMATION_OPTIONS = (
+    'animation_precision',
+    'trim_zeros',
+    'compact_dae',
+)
+EFFECT_OPTIONS = (
+    'compact_dae',
+)
+
 AXES = {
     'X': 0,
     'Y': 1,
@@ -53,50 +82,105 @@ class CrytekDaeExporter:
         self.__config = config
         self.__doc = Document()
         self.__materials = self.__get_materials()
-
-    def export(self):
+        self.__geometry_ids = {}
+        self.__material_records = []
+        # First frame transform of every animated bone by armature name.
+        self.__bone_transforms = {}
+        # Plain copy of the config for the writers, which may run in worker
+        # processes.
+        self.__job_config = workers.get_config(config)
+        self.__pool = None
+        self.__shared_arrays = None
+        self.__cache = None
+        if config.use_cache:
+            self.__cache = cache.FragmentCache(
+                bpy.path.abspath(config.cache_directory),
+                config.cache_size * 1024 * 1024)
+
+    def export(self, on_converted=None):
+        '''Export the DAE file and convert it, on_converted is called from
+        the RC thread once the conversion succeeded.'''
         self.__prepare_for_export()
 
+        filepath = bpy.path.ensure_ext(self.__config.filepath, ".dae")
+        stream = self.__config.stream_dae or self.__config.incremental_dae
+        if stream:
+            previous = None
+            if self.__config.incremental_dae:
+                previous = daewriter.load_previous(filepath)
+
+            # The file is streamed next to the old one, which it replaces
+            # only once complete. Until then the old file can be compared
+            # to it and unchanged elements are copied from there.
+            stream_path = "{}.tmp".format(filepath)
+            writer = daewriter.StreamWriter(
+                stream_path, not self.__config.compact_dae, previous)
+        else:
+            writer = daewriter.DomWriter(self.__doc)
+
         root_element = self.__doc.createElement('collada')
         root_element.setAttribute(
             "xmlns", "http://www.collada.org/2005/11/COLLADASchema")
         root_element.setAttribute("version", "1.4.1")
-        self.__doc.appendChild(root_element)
-        self.__create_file_header(root_element)
-
-        # Just here for future use:
-        self.__export_library_cameras(root_element)
-        self.__export_library_lights(root_element)
-        ###
-
-        self.__export_library_images(root_element)
-        self.__export_library_effects(root_element)
-        self.__export_library_materials(root_element)
-        self.__export_library_geometries(root_element)
-
-        utils.add_fakebones()
+        if self.__config.parallel_export:
+            # Blender before 2.91 is its own sys.executable.
+            self.__pool = workers.create_pool(
+                self.__config.export_workers,
+                getattr(bpy.app, "binary_path_python", None))
+        if self.__pool is not None:
+            self.__shared_arrays = workers.SharedArrays()
+        completed = False
         try:
-            self.__export_library_controllers(root_element)
-            self.__export_library_animation_clips_and_animations(root_element)
-            self.__export_library_visual_scenes(root_element)
-        except RuntimeError:
-            pass
+            with writer.element(root_element):
+                self.__export_libraries(writer)
+            completed = True
         finally:
-            utils.remove_fakebones()
-
-        self.__export_scene(root_element)
+            writer.close()
+            if self.__pool is not None:
+                self.__pool.shutdown()
+                self.__shared_arrays.close()
+            if stream and not completed:
+                utils.remove_file(stream_path)
 
         converter = RCInstance(self.__config)
-        converter.convert_dae(self.__doc)
+        if stream:
+            changed = utils.replace_file(
+                stream_path, filepath, self.__config.deterministic_dae)
+            if self.__config.incremental_dae:
+                writer.save_index(filepath)
+            converter.convert_dae(None, changed, on_converted)
+        else:
+            converter.convert_dae(self.__doc, on_success=on_converted)
+
+        if self.__cache is not None:
+            self.__cache.evict()
 
         write_scripts(self.__config)
 
+    def __export_libraries(self, writer):
+        self.__create_file_header(writer)
+
+        # Just here for future use:
+        self.__export_library_cameras(writer)
+        self.__export_library_lights(writer)
+        ###
+
+        self.__export_library_images(writer)
+        self.__export_library_effects(writer)
+        self.__export_library_materials(writer)
+        self.__export_library_geometries(writer)
+        self.__export_library_controllers(writer)
+        self.__export_library_animation_clips_and_animations(writer)
+        self.__export_library_visual_scenes(writer)
+        self.__export_scene(writer)
+
     def __get_materials(self):
         materials = OrderedDict()
         material_counter = {}
 
         for group in utils.get_export_nodes(
-                self.__config.export_selected_nodes):
+                self.__config.export_selected_nodes,
+                self.__config.export_dirty_nodes):
             material_counter[group.name] = 50
             for object in group.objects:
                 for slot in object.material_slots:
@@ -137,9 +221,8 @@ class CrytekDaeExporter:
         if self.__config.fix_weights:
             utils.fix_weights()
 
-    def __create_file_header(self, parent_element):
+    def __create_file_header(self, writer):
         asset = self.__doc.createElement('asset')
-        parent_element.appendChild(asset)
         contributor = self.__doc.createElement('contributor')
         asset.appendChild(contributor)
         author = self.__doc.createElement('author')
@@ -152,9 +235,10 @@ class CrytekDaeExporter:
         author_tool.appendChild(author_name_text)
         contributor.appendChild(author_tool)
         created = self.__doc.createElement('created')
-        created_value = self.__doc.createTextNode(
-            datetime.now().isoformat(' '))
-        created.appendChild(created_value)
+        if not self.__config.deterministic_dae:
+            created_value = self.__doc.createTextNode(
+                datetime.now().isoformat(' '))
+            created.appendChild(created_value)
         asset.appendChild(created)
         modified = self.__doc.createElement('modified')
         asset.appendChild(modified)
@@ -166,22 +250,22 @@ class CrytekDaeExporter:
         z_up = self.__doc.createTextNode('Z_UP')
         up_axis.appendChild(z_up)
         asset.appendChild(up_axis)
+        writer.append(asset)
 
-    def __export_library_cameras(self, root_element):
+    def __export_library_cameras(self, writer):
         library_cameras = self.__doc.createElement('library_cameras')
-        root_element.appendChild(library_cameras)
+        writer.append(library_cameras)
 
-    def __export_library_lights(self, root_element):
+    def __export_library_lights(self, writer):
         library_lights = self.__doc.createElement('library_lights')
-        root_element.appendChild(library_lights)
+        writer.append(library_lights)
 
 #------------------------------------------------------------------
 # Library Images:
 #------------------------------------------------------------------
 
-    def __export_library_images(self, parent_element):
+    def __export_library_images(self, writer):
         library_images = self.__doc.createElement('library_images')
-        parent_element.appendChild(library_images)
 
         if bpy.context.scene.render.engine == 'CYCLES':
             images = self.__get_nodes_images_in_export_nodes()
@@ -192,6 +276,8 @@ class CrytekDaeExporter:
             image_element = self.__export_library_image(image)
             library_images.appendChild(image_element)
 
+        writer.append(library_images)
+
         if self.__config.do_textures:
             self.__convert_images_to_dds(images)
 
@@ -224,7 +310,7 @@ class CrytekDaeExporter:
                 pass
 
         # return only unique images
-        return list(set(images))
+        return utils.unique(images)
 
     def __get_image_textures_in_export_nodes(self):
         images = []
@@ -240,7 +326,7 @@ class CrytekDaeExporter:
                 pass
 
         # return only unique images
-        return list(set(images))
+        return utils.unique(images)
 
     def __convert_images_to_dds(self, images):
         converter = RCInstance(self.__config)
@@ -250,16 +336,25 @@ class CrytekDaeExporter:
 # Library Effects:
 #--------------------------------------------------------------
 
-    def __export_library_effects(self, parent_element):
+    def __export_library_effects(self, writer):
         current_element = self.__doc.createElement('library_effects')
-        parent_element.appendChild(current_element)
-        for material, materialname in self.__materials.items():
-            self.__export_library_effects_material(
-                material, materialname, current_element)
+        with writer.element(current_element):
+            self.__append_fragments(
+                writer, "effect", self.__get_effect_jobs())
 
-    def __export_library_effects_material(
-            self, material, materialname, current_element):
-        images = [[], [], []]
+    def __get_effect_jobs(self):
+        for material, materialname in self.__materials.items():
+            material = self.__get_material(material, materialname)
+            self.__material_records.append(material)
+            key = self.__get_cache_key(
+                "effect", EFFECT_OPTIONS, material.name, material.emission,
+                material.ambient, material.diffuse, material.specular,
+                material.shininess, material.index_refraction,
+                material.images)
+            yield key, elements.write_effect, (material, self.__job_config)
+
+    def __get_material(self, material, materialname):
+        images = [None, None, None]
 
         is_cycles_render = bpy.context.scene.render.engine == 'CYCLES'
 
@@ -268,27 +363,15 @@ class CrytekDaeExporter:
         else:
             self.__get_blender_render_images(material, images)
 
-        effect_node = self.__doc.createElement("effect")
-        effect_node.setAttribute("id", "{}_fx".format(materialname))
-        profile_node = self.__doc.createElement("profile_COMMON")
-        for image in images:
-            if len(image) != 0:
-                profile_node.appendChild(image[1])
-                profile_node.appendChild(image[2])
-        technique_common = self.__doc.createElement("technique")
-        technique_common.setAttribute("sid", "common")
-
-        phong = self.__create_material_node(material, images)
-        technique_common.appendChild(phong)
-        profile_node.appendChild(technique_common)
-
-        extra = self.__create_double_sided_extra("GOOGLEEARTH")
-        profile_node.appendChild(extra)
-        effect_node.appendChild(profile_node)
-
-        extra = self.__create_double_sided_extra("MAX3D")
-        effect_node.appendChild(extra)
-        current_element.appendChild(effect_node)
+        return ir.Material(
+            materialname,
+            utils.get_material_color(material, "emission"),
+            utils.get_material_color(material, "ambient"),
+            utils.get_material_color(material, "diffuse"),
+            utils.get_material_color(material, "specular"),
+            utils.get_material_attribute(material, "shininess"),
+            utils.get_material_attribute(material, "index_refraction"),
+            tuple(images))
 
     def __get_cycles_render_images(self, material, images):
         cycles_nodes = utils.get_texture_nodes_for_material(material)
@@ -298,13 +381,12 @@ class CrytekDaeExporter:
                 raise exceptions.CryBlendException(
                     "One of texture slots has no image assigned.")
 
-            surface, sampler = self.__create_surface_and_sampler(image.name)
             if cycles_node.name == "Image Texture":
-                images[0] = [image.name, surface, sampler]
+                images[0] = image.name
             if cycles_node.name == "Specular":
-                images[1] = [image.name, surface, sampler]
+                images[1] = image.name
             if cycles_node.name == "Normal":
-                images[2] = [image.name, surface, sampler]
+                images[2] = image.name
 
     def __get_blender_render_images(self, material, images):
         texture_slots = utils.get_texture_slots_for_material(material)
@@ -314,505 +396,264 @@ class CrytekDaeExporter:
                 raise exceptions.CryBlendException(
                     "One of texture slots has no image assigned.")
 
-            surface, sampler = self.__create_surface_and_sampler(image.name)
             if texture_slot.use_map_color_diffuse:
-                images[0] = [image.name, surface, sampler]
+                images[0] = image.name
             if texture_slot.use_map_color_spec:
-                images[1] = [image.name, surface, sampler]
+                images[1] = image.name
             if texture_slot.use_map_normal:
-                images[2] = [image.name, surface, sampler]
-
-    def __create_surface_and_sampler(self, image_name):
-        surface = self.__doc.createElement("newparam")
-        surface.setAttribute("sid", "{}-surface".format(image_name))
-        surface_node = self.__doc.createElement("surface")
-        surface_node.setAttribute("type", "2D")
-        init_from_node = self.__doc.createElement("init_from")
-        temp_node = self.__doc.createTextNode(image_name)
-        init_from_node.appendChild(temp_node)
-        surface_node.appendChild(init_from_node)
-        surface.appendChild(surface_node)
-        sampler = self.__doc.createElement("newparam")
-        sampler.setAttribute("sid", "{}-sampler".format(image_name))
-        sampler_node = self.__doc.createElement("sampler2D")
-        source_node = self.__doc.createElement("source")
-        temp_node = self.__doc.createTextNode(
-            "{}-surface".format(image_name))
-        source_node.appendChild(temp_node)
-        sampler_node.appendChild(source_node)
-        sampler.appendChild(sampler_node)
-
-        return surface, sampler
-
-    def __create_material_node(self, material, images):
-        phong = self.__doc.createElement("phong")
-
-        emission = self.__create_color_node(material, "emission")
-        ambient = self.__create_color_node(material, "ambient")
-        if len(images[0]) != 0:
-            diffuse = self.__create_texture_node(images[0][0], "diffuse")
-        else:
-            diffuse = self.__create_color_node(material, "diffuse")
-        if len(images[1]) != 0:
-            specular = self.__create_texture_node(images[1][0], "specular")
-        else:
-            specular = self.__create_color_node(material, "specular")
-
-        shininess = self.__create_attribute_node(material, "shininess")
-        index_refraction = self.__create_attribute_node(
-            material, "index_refraction")
-
-        phong.appendChild(emission)
-        phong.appendChild(ambient)
-        phong.appendChild(diffuse)
-        phong.appendChild(specular)
-        phong.appendChild(shininess)
-        phong.appendChild(index_refraction)
-        if len(images[2]) != 0:
-            normal = self.__create_texture_node(images[2][0], "normal")
-            phong.appendChild(normal)
-
-        return phong
-
-    def __create_color_node(self, material, type_):
-        node = self.__doc.createElement(type_)
-        color = self.__doc.createElement("color")
-        color.setAttribute("sid", type_)
-        col = utils.get_material_color(material, type_)
-        color_text = self.__doc.createTextNode(col)
-        color.appendChild(color_text)
-        node.appendChild(color)
-
-        return node
-
-    def __create_texture_node(self, image_name, type_):
-        node = self.__doc.createElement(type_)
-        texture = self.__doc.createElement("texture")
-        texture.setAttribute("texture", "{}-sampler".format(image_name))
-        node.appendChild(texture)
-
-        return node
-
-    def __create_attribute_node(self, material, type_):
-        node = self.__doc.createElement(type_)
-        float = self.__doc.createElement("float")
-        float.setAttribute("sid", type_)
-        val = utils.get_material_attribute(material, type_)
-        value = self.__doc.createTextNode(val)
-        float.appendChild(value)
-        node.appendChild(float)
-
-        return node
-
-    def __create_double_sided_extra(self, profile):
-        extra = self.__doc.createElement("extra")
-        technique = self.__doc.createElement("technique")
-        technique.setAttribute("profile", profile)
-        double_sided = self.__doc.createElement("double_sided")
-        double_sided_value = self.__doc.createTextNode("1")
-        double_sided.appendChild(double_sided_value)
-        technique.appendChild(double_sided)
-        extra.appendChild(technique)
-
-        return extra
+                images[2] = image.name
 
 #------------------------------------------------------------------
 # Library Materials:
 #------------------------------------------------------------------
 
-    def __export_library_materials(self, parent_element):
+    def __export_library_materials(self, writer):
         library_materials = self.__doc.createElement('library_materials')
 
-        for material, materialname in self.__materials.items():
-            material_element = self.__doc.createElement('material')
-            material_element.setAttribute('id', materialname)
-            instance_effect = self.__doc.createElement('instance_effect')
-            instance_effect.setAttribute('url', '#{}_fx'.format(materialname))
-            material_element.appendChild(instance_effect)
+        for material in self.__material_records:
+            material_element = elements.write_material(material)
             library_materials.appendChild(material_element)
 
-        parent_element.appendChild(library_materials)
+        writer.append(library_materials)
 
 #------------------------------------------------------------------
 # Library Geometries:
 #------------------------------------------------------------------
 
-    def __export_library_geometries(self, parent_element):
+    def __export_library_geometries(self, writer):
         libgeo = self.__doc.createElement("library_geometries")
-        parent_element.appendChild(libgeo)
-        for object_ in utils.get_type("geometry"):
+        with writer.element(libgeo):
+            self.__append_fragments(
+                writer, "geometry", self.__get_geometry_jobs())
+
+    def __get_geometry_jobs(self):
+        geometries = {}
+        for object_ in self.__get_geometry_objects():
             utils.set_active(object_)
             if object_.mode != 'OBJECT':
                 bpy.ops.object.mode_set(mode='OBJECT')
-            object_.data.update(calc_tessface=1)
-            mesh = object_.data
             object_.name = object_.name
-            geometry_node = self.__doc.createElement("geometry")
-            geometry_node.setAttribute("id", object_.name)
-            mesh_node = self.__doc.createElement("mesh")
 
-            start_time = clock()
-            self.__write_positions(object_, mesh, mesh_node)
-            cbPrint('Positions took {:.4f} sec.'.format(clock() - start_time))
-
-            start_time = clock()
-            self.__write_normals(object_, mesh, mesh_node)
-            cbPrint('Normals took {:.4f} sec.'.format(clock() - start_time))
+            materialnames = tuple(
+                self.__get_materials_for_object(object_).values())
+            data_key = (object_.data.name, materialnames)
+            if data_key in geometries:
+                self.__geometry_ids[object_.name] = geometries[data_key]
+                continue
 
             start_time = clock()
-            self.__write_uvs(object_, mesh, mesh_node)
-            cbPrint('UVs took {:.4f} sec.'.format(clock() - start_time))
+            buffers = meshdata.MeshBuffers(
+                object_.data, self.__config.export_tangents)
+            cbPrint('Extraction took {:.4f} sec.'.format(
+                clock() - start_time))
+
+            content_key = (buffers.get_hash(), materialnames)
+            if content_key in geometries:
+                geometries[data_key] = geometries[content_key]
+                self.__geometry_ids[object_.name] = geometries[content_key]
+                cbPrint('{} shares the geometry of {}.'.format(
+                    object_.name, geometries[content_key]))
+                continue
 
-            start_time = clock()
-            self.__write_vertex_colors(object_, mesh, mesh_node)
-            cbPrint(
-                'Vertex colors took {:.4f} sec.'.format(
-                    clock() - start_time))
+            geometries[data_key] = geometries[content_key] = object_.name
+            self.__geometry_ids[object_.name] = object_.name
 
-            start_time = clock()
-            self.__write_vertices(object_, mesh, mesh_node)
-            cbPrint('Vertices took {:.4f} sec.'.format(clock() - start_time))
+            geometry = ir.Geometry(object_.name, materialnames, buffers)
+            key = self.__get_cache_key(
+                "geometry", GEOMETRY_OPTIONS, geometry.id,
+                geometry.material_names, buffers.get_hash())
+            yield key, elements.write_geometry, (geometry, self.__job_config)
 
-            start_time = clock()
-            self.__write_polylist(object_, mesh, mesh_node)
-            cbPrint('Polylist took {:.4f} sec.'.format(clock() - start_time))
-
-            extra = self.__create_double_sided_extra("MAYA")
-            mesh_node.appendChild(extra)
-            geometry_node.appendChild(mesh_node)
-            libgeo.appendChild(geometry_node)
-
-    def __write_positions(self, object_, mesh, root):
-        float_positions = []
-        for vertex in mesh.vertices:
-            float_positions.extend(vertex.co)
-
-        id_ = "{!s}-positions".format(object_.name)
-        source = utils.write_source(id_, "float", float_positions, "XYZ")
-        root.appendChild(source)
-
-    def __write_normals(self, object_, mesh, root):
-        float_normals = []
-        float_normals_count = ""
-
-        for face in mesh.tessfaces:
-            if face.use_smooth:
-                for vert in face.vertices:
-                    vertex = mesh.vertices[vert]
-                    float_normals.extend(vertex.normal)
-            else:
-                if self.__config.average_planar:
-                    count = 1
-                    nx = face.normal.x
-                    ny = face.normal.y
-                    nz = face.normal.z
-
-                    for planar_face in mesh.tessfaces:
-                        angle = face.normal.angle(planar_face.normal)
-                        if (-.052 < angle and angle < .052):
-                            nx += planar_face.normal.x
-                            ny += planar_face.normal.y
-                            nz += planar_face.normal.z
-                            count += 1
-
-                    float_normals.append(nx / count)
-                    float_normals.append(ny / count)
-                    float_normals.append(nz / count)
-                else:
-                    float_normals.extend(face.normal)
+    def __get_geometry_objects(self):
+        '''Meshes of the export nodes written by this export.'''
+        objects = []
+        for group in utils.get_export_nodes(
+                self.__config.export_selected_nodes,
+                self.__config.export_dirty_nodes):
+            objects.extend(object_ for object_ in group.objects
+                           if object_.type == "MESH" and
+                           not utils.is_fakebone(object_))
+
+        return utils.unique(objects)
+
+    def __get_cache_key(self, kind, options, *parts):
+        values = tuple(getattr(self.__config, option) for option in options)
+        return cache.get_key(
+            kind, self.__config.cryblend_version, values, *parts)
+
+    def __append_fragments(self, writer, tag_name, jobs):
+        '''Append the elements made by jobs, (key, function, args) tuples,
+        in their order. Jobs with a key are spliced from the previous file
+        or taken from the fragment cache where possible.'''
+        if self.__pool is None:
+            for job in jobs:
+                job = self.__start_job(writer, tag_name, *job)
+                self.__finish_job(writer, tag_name, *job)
+            return
+
+        # Jobs are finished in their order. The oldest one is finished
+        # before another starts once enough are in flight, which releases
+        # its shared arrays.
+        max_started = workers.JOBS_PER_WORKER * workers.get_worker_count(
+            self.__config.export_workers)
+        started = deque()
+        try:
+            for job in jobs:
+                if len(started) >= max_started:
+                    self.__finish_job(writer, tag_name, *started[0])
+                    started.popleft()
+                started.append(self.__start_job(writer, tag_name, *job))
+            while started:
+                self.__finish_job(writer, tag_name, *started[0])
+                started.popleft()
+        finally:
+            # Jobs left after an error are dropped with their arrays.
+            for key, function, args, fragment, future, names in started:
+                if future is not None:
+                    future.cancel()
+                self.__shared_arrays.release(names)
+
+    def __start_job(self, writer, tag_name, key, function, args):
+        fragment = future = None
+        names = ()
+        if not writer.can_splice(key):
+            fragment = self.__get_cached(tag_name, key)
+            if fragment is None and self.__pool is not None:
+                shared_args, names = self.__shared_arrays.share(args)
+                future = self.__pool.submit(
+                    workers.write_fragment, function, shared_args,
+                    not self.__config.compact_dae)
+
+        return key, function, args, fragment, future, names
+
+    def __finish_job(self, writer, tag_name, key, function, args, fragment,
+                     future, names):
+        if writer.splice(key):
+            return
+
+        if future is not None:
+            fragment = future.result()
+            self.__shared_arrays.release(names)
+            self.__put_cached(key, fragment)
+        elif fragment is None:
+            element = function(*args)
+            if self.__cache is None or key is None:
+                writer.append(element, key)
+                return
+            fragment = daewriter.to_fragment(
+                element, not self.__config.compact_dae)
+            self.__put_cached(key, fragment)
 
-        id_ = "{!s}-normals".format(object_.name)
-        source = utils.write_source(id_, "float", float_normals, "XYZ")
-        root.appendChild(source)
+        writer.append(daewriter.RawXml(tag_name, fragment), key)
 
-    def __write_uvs(self, object_, mesh, root):
-        uvdata = object_.data.tessface_uv_textures
-        if uvdata is None:
-            cbPrint("Your UV map is missing, adding...")
-            bpy.ops.mesh.uv_texture_add()
-        else:
-            cbPrint("Found UV map.")
-
-        float_uvs = []
-        for uvindex, uvlayer in enumerate(uvdata):
-            mapslot = uvindex
-            mapname = uvlayer.name
-            uvid = "{!s}-{!s}-{!s}".format(object_.name, mapname, mapslot)
-
-            for uf in uvlayer.data:
-                for uv in uf.uv:
-                    float_uvs.extend(uv)
-
-        id_ = "{!s}-UVMap-0".format(object_.name)
-        source = utils.write_source(id_, "float", float_uvs, "ST")
-        root.appendChild(source)
-
-    def __write_vertex_colors(self, object_, mesh, root):
-        float_colors = []
-        alpha_found = False
-
-        if object_.data.tessface_vertex_colors:
-            color_layers = object_.data.tessface_vertex_colors
-            for color_layer in color_layers:
-                for fi, face in enumerate(color_layer.data):
-                    colors = [face.color1[:], face.color2[:], face.color3[:]]
-                    if len(mesh.tessfaces[fi].vertices) == 4:
-                        colors.append(face.color4[:])
-
-                    for color in colors:
-                        if color_layer.name.lower() == "alpha":
-                            alpha_found = True
-                            alpha = (color[0] + color[1] + color[2]) / 3
-                            float_colors.extend([1, 1, 1, alpha])
-                        else:
-                            float_colors.extend(color)
-
-        if float_colors:
-            id_ = "{!s}-colors".format(object_.name)
-            params = ("RGBA" if alpha_found else "RGB")
-            source = utils.write_source(id_, "float", float_colors, params)
-            root.appendChild(source)
-
-    def __write_vertices(self, object_, mesh, root):
-        vertices = self.__doc.createElement("vertices")
-        vertices.setAttribute("id", "{}-vertices".format(object_.name))
-        input = utils.write_input(object_.name, None, "positions", "POSITION")
-        vertices.appendChild(input)
-        root.appendChild(vertices)
-
-    def __write_polylist(self, object_, mesh, root):
-        matindex = 0
-        for material, materialname in self.__get_materials_for_object(
-                object_).items():
-            vert_data = ''
-            verts_per_poly = ''
-            poly_count = normal = texcoord = 0
-
-            for face in mesh.tessfaces:
-                if face.material_index == matindex:
-                    verts_per_poly = join(
-                        verts_per_poly, len(
-                            face.vertices), ' ')
-                    poly_count += 1
-                    for vert in face.vertices:
-                        data = self.__write_vertex_data(
-                            mesh, face, vert, normal, texcoord)
-                        vert_data = join(vert_data, data)
-                        texcoord += 1
-                else:
-                    texcoord += len(face.vertices)
+    def __get_cached(self, tag_name, key):
+        if self.__cache is None or key is None:
+            return None
 
-                if face.use_smooth:
-                    normal += len(face.vertices)
-                else:
-                    normal += 1
+        fragment = self.__cache.get(key)
+        if fragment is not None:
+            cbPrint("Using cached {}.".format(tag_name))
+        return fragment
 
-            if poly_count == 0:
-                matindex += 1
-                continue
+    def __put_cached(self, key, fragment):
+        if self.__cache is not None and key is not None:
+            self.__cache.put(key, fragment)
 
-            polylist = self.__doc.createElement('polylist')
-            polylist.setAttribute('material', materialname)
-            polylist.setAttribute('count', str(poly_count))
-
-            inputs = []
-            inputs.append(
-                utils.write_input(
-                    object_.name,
-                    0,
-                    'vertices',
-                    'VERTEX'))
-            inputs.append(
-                utils.write_input(
-                    object_.name,
-                    1,
-                    'normals',
-                    'NORMAL'))
-            inputs.append(
-                utils.write_input(
-                    object_.name,
-                    2,
-                    'UVMap-0',
-                    'TEXCOORD'))
-            if mesh.vertex_colors:
-                inputs.append(
-                    utils.write_input(
-                        object_.name,
-                        3,
-                        'colors',
-                        'COLOR'))
-
-            for input in inputs:
-                polylist.appendChild(input)
-
-            vcount = self.__doc.createElement('vcount')
-            vcount_text = self.__doc.createTextNode(verts_per_poly)
-            vcount.appendChild(vcount_text)
-
-            p = self.__doc.createElement('p')
-            p_text = self.__doc.createTextNode(vert_data)
-            p.appendChild(p_text)
-
-            polylist.appendChild(vcount)
-            polylist.appendChild(p)
-            root.appendChild(polylist)
-            matindex += 1
-
-    def __write_vertex_data(self, mesh, face, vert, normal, texcoord):
-        if face.use_smooth:
-            normal = vert
-
-        if mesh.vertex_colors:
-            return "{:d} {:d} {:d} {:d} ".format(
-                vert, normal, texcoord, texcoord)
-        else:
-            return "{:d} {:d} {:d} ".format(vert, normal, texcoord)
+    def __get_geometry_id(self, object_):
+        return self.__geometry_ids.get(object_.name, object_.name)
 
 # -------------------------------------------------------------------------
 # Library Controllers: --> Skeleton Armature and List of Bone Names
 #                      --> Skin Geometry, Weights, Transform Matrices
 # -------------------------------------------------------------------------
 
-    def __export_library_controllers(self, parent_element):
+    def __export_library_controllers(self, writer):
         library_node = self.__doc.createElement("library_controllers")
 
-        for object_ in utils.get_type("geometry"):
+        with writer.element(library_node):
+            self.__append_fragments(
+                writer, "controller", self.__get_skin_jobs())
+
+    def __get_skin_jobs(self):
+        for object_ in self.__get_geometry_objects():
             if not utils.is_bone_geometry(object_):
                 armature = utils.get_armature_for_object(object_)
                 if armature is not None:
-                    self.__process_bones(library_node,
-                                         object_,
-                                         armature)
-
-        parent_element.appendChild(library_node)
-
-    def __process_bones(self, parent_node, object_, armature):
-        mesh = object_.data
-        id_ = "{!s}_{!s}".format(armature.name, object_.name)
-
-        controller_node = self.__doc.createElement("controller")
-        parent_node.appendChild(controller_node)
-        controller_node.setAttribute("id", id_)
-
-        skin_node = self.__doc.createElement("skin")
-        skin_node.setAttribute("source", "#{}".format(object_.name))
-        controller_node.appendChild(skin_node)
-
-        bind_shape_matrix = self.__doc.createElement("bind_shape_matrix")
-        utils.write_matrix(Matrix(), bind_shape_matrix)
-        skin_node.appendChild(bind_shape_matrix)
-
-        self.__process_bone_joints(object_, armature, skin_node)
-        self.__process_bone_matrices(object_, armature, skin_node)
-        self.__process_bone_weights(object_, armature, skin_node)
-
-        joints = self.__doc.createElement("joints")
-        input = utils.write_input(id_, None, "joints", "JOINT")
-        joints.appendChild(input)
-        input = utils.write_input(id_, None, "matrices", "INV_BIND_MATRIX")
-        joints.appendChild(input)
-        skin_node.appendChild(joints)
-
-    def __process_bone_joints(self, object_, armature, skin_node):
-
+                    skin = self.__get_skin(object_, armature)
+                    key = self.__get_cache_key(
+                        "skin", SKIN_OPTIONS, skin.id, skin.geometry_id,
+                        tuple(skin.joint_names),
+                        skin.bind_matrices.tobytes(),
+                        skin.influence_counts.tobytes(),
+                        skin.joints.tobytes(), skin.weights.tobytes())
+                    yield key, elements.write_skin, (skin, self.__job_config)
+
+    def __get_skin(self, object_, armature):
         bones = utils.get_bones(armature)
-        id_ = "{!s}_{!s}-joints".format(armature.name, object_.name)
+        id_ = "{!s}_{!s}".format(armature.name, object_.name)
+        influence_counts, joints, weights = self.__get_bone_weights(
+            object_, bones)
+
+        return ir.Skin(id_,
+                       self.__get_geometry_id(object_),
+                       self.__get_bone_joints(object_, bones),
+                       self.__get_bone_matrices(armature),
+                       influence_counts,
+                       joints,
+                       weights)
+
+    def __get_bone_joints(self, object_, bones):
         node_name = utils.get_armature_node_name(object_)
         bone_names = []
         for bone in bones:
             props_name = self.__create_props_bone_name(bone, node_name)
             bone_name = "{!s}{!s}".format(bone.name, props_name)
             bone_names.append(bone_name)
-        source = utils.write_source(id_, "IDREF", bone_names, [])
-        skin_node.appendChild(source)
-
-    def __process_bone_matrices(self, object_, armature, skin_node):
-
-        bones = utils.get_bones(armature)
-        bone_matrices = []
-        for bone in bones:
-            fakebone = utils.get_fakebone(bone.name)
-            if fakebone is None:
-                return
-            matrix_local = copy.deepcopy(fakebone.matrix_local)
-            utils.negate_z_axis_of_matrix(matrix_local)
-            bone_matrices.extend(utils.matrix_to_array(matrix_local))
 
-        id_ = "{!s}_{!s}-matrices".format(armature.name, object_.name)
-        source = utils.write_source(id_, "float4x4", bone_matrices, [])
-        skin_node.appendChild(source)
+        return bone_names
 
-    def __process_bone_weights(self, object_, armature, skin_node):
+    def __get_bone_matrices(self, armature):
+        heads = skeleton.read_heads(armature)
+        return skeleton.get_inverse_bind_matrices(heads)
 
-        bones = utils.get_bones(armature)
-        group_weights = []
-        vw = ""
-        vertex_groups_lengths = ""
-        vertex_count = 0
+    def __get_bone_weights(self, object_, bones):
         bone_list = {}
-
         for bone_id, bone in enumerate(bones):
             bone_list[bone.name] = bone_id
 
-        for vertex in object_.data.vertices:
-            vertex_group_count = 0
-            for group in vertex.groups:
-                group_name = object_.vertex_groups[group.group].name
-                if (group.weight == 0 or
-                        group_name not in bone_list):
-                    continue
-                if vertex_group_count == 8:
-                    cbPrint("Too many bone references in {}:{} vertex group"
-                            .format(object_.name, group_name))
-                    continue
-                group_weights.append(group.weight)
-                vw = "{}{} {} ".format(vw, bone_list[group_name], vertex_count)
-                vertex_count += 1
-                vertex_group_count += 1
-
-            vertex_groups_lengths = "{}{} ".format(vertex_groups_lengths,
-                                                   vertex_group_count)
-
-        id_ = "{!s}_{!s}-weights".format(armature.name, object_.name)
-        source = utils.write_source(id_, "float", group_weights, [])
-        skin_node.appendChild(source)
-
-        vertex_weights = self.__doc.createElement("vertex_weights")
-        vertex_weights.setAttribute("count", str(len(object_.data.vertices)))
-
-        id_ = "{!s}_{!s}".format(armature.name, object_.name)
-        input = utils.write_input(id_, 0, "joints", "JOINT")
-        vertex_weights.appendChild(input)
-        input = utils.write_input(id_, 1, "weights", "WEIGHT")
-        vertex_weights.appendChild(input)
-
-        vcount = self.__doc.createElement("vcount")
-        vcount_text = self.__doc.createTextNode(vertex_groups_lengths)
-        vcount.appendChild(vcount_text)
-        vertex_weights.appendChild(vcount)
+        bone_ids = [bone_list.get(group.name, -1)
+                    for group in object_.vertex_groups]
+        counts, groups, weights = meshdata.read_vertex_groups(object_.data)
+        counts, joints, weights = meshdata.get_influences(
+            counts, groups, weights, bone_ids)
 
-        v = self.__doc.createElement("v")
-        v_text = self.__doc.createTextNode(vw)
-        v.appendChild(v_text)
-        vertex_weights.appendChild(v)
+        max_influences = self.__config.max_influences
+        dropped = int(numpy.maximum(counts - max_influences, 0).sum())
+        if dropped:
+            cbPrint("Too many bone references in {}, {:d} dropped.".format(
+                object_.name, dropped))
 
-        skin_node.appendChild(vertex_weights)
+        # Conditioned on export only, the mesh keeps its weights.
+        return meshdata.condition_influences(
+            counts, joints, weights, max_influences,
+            self.__config.weight_threshold, self.__config.normalize_weights,
+            self.__config.quantize_weights)
 
 # -----------------------------------------------------------------------------
-# Library Animation and Clips: --> Animations, Fakebones, Bone Geometries
+# Library Animation and Clips: --> Animations, Bones, Bone Geometries
 # -----------------------------------------------------------------------------
 
-    def __export_library_animation_clips_and_animations(self, parent_element):
+    def __export_library_animation_clips_and_animations(self, writer):
         libanmcl = self.__doc.createElement("library_animation_clips")
         libanm = self.__doc.createElement("library_animations")
-        parent_element.appendChild(libanmcl)
-        parent_element.appendChild(libanm)
+        animations = []
 
         scene = bpy.context.scene
 
         ALLOWED_NODE_TYPES = ("cga", "anm", "i_caf")
         for group in utils.get_export_nodes(
-                self.__config.export_selected_nodes):
+                self.__config.export_selected_nodes,
+                self.__config.export_dirty_nodes):
             node_type = utils.get_node_type(group)
             if node_type in ALLOWED_NODE_TYPES:
                 animation_clip = self.__doc.createElement("animation_clip")
@@ -829,6 +670,12 @@ class CrytekDaeExporter:
                             scene.frame_end)))
                 is_animation = False
 
+                for armature in group.objects:
+                    if armature.type == 'ARMATURE':
+                        is_animation = True
+                        animations.extend(self.__get_bone_animations(
+                            armature, node_name, animation_clip))
+
                 for object_ in bpy.context.selected_objects:
                     if (object_.type != 'ARMATURE' and object_.animation_data and
                             object_.animation_data.action):
@@ -843,13 +690,13 @@ class CrytekDaeExporter:
                             animation = self.__get_animation_location(
                                 object_, bone_name, axis)
                             if animation is not None:
-                                libanm.appendChild(animation)
+                                animations.append(animation)
 
                         for axis in iter(AXES):
                             animation = self.__get_animation_rotation(
                                 object_, bone_name, axis)
                             if animation is not None:
-                                libanm.appendChild(animation)
+                                animations.append(animation)
 
                         self.__export_instance_animation_parameters(
                             object_, animation_clip)
@@ -857,6 +704,67 @@ class CrytekDaeExporter:
                 if is_animation:
                     libanmcl.appendChild(animation_clip)
 
+        writer.append(libanmcl)
+        with writer.element(libanm):
+            self.__append_fragments(writer, "animation", (
+                (key, elements.write_animation,
+                 (animation, self.__job_config))
+                for key, animation in animations))
+
+    def __get_bone_animations(self, armature, node_name, animation_clip):
+        '''Location and rotation channels of every bone, solved for the
+        whole clip at once from the sampled joint matrices.'''
+        scene = bpy.context.scene
+        frames = range(scene.frame_start, scene.frame_end + 1)
+        joints = skeleton.sample_joint_matrices(armature, frames, scene)
+
+        # Children of the root bone are keyed in armature space.
+        parents = skeleton.read_parents(armature)
+        parents = numpy.where(
+            (parents >= 0) & (parents[parents] >= 0), parents, -1)
+        locations, rotations = skeleton.solve_local_transforms(
+            joints, parents)
+
+        transforms = {}
+        self.__bone_transforms[armature.name] = transforms
+
+        animations = []
+        frames = numpy.array(frames, numpy.float32)
+        for index, pose_bone in enumerate(armature.pose.bones):
+            transforms[pose_bone.name] = (locations[0, index],
+                                          rotations[0, index])
+
+            props_name = self.__create_props_bone_name(pose_bone, node_name)
+            bone_name = "{!s}{!s}".format(pose_bone.name, props_name)
+            for axis in iter(AXES):
+                values = locations[:, index, AXES[axis]]
+                animations.append(self.__create_animation(
+                    "{!s}_location_{!s}".format(pose_bone.name, axis),
+                    self.__get_location_target(bone_name, axis), 1,
+                    *self.__get_linear_keys(frames, values)))
+
+            for axis in iter(AXES):
+                values = rotations[:, index, AXES[axis]]
+                animations.append(self.__create_animation(
+                    "{!s}_rotation_euler_{!s}".format(pose_bone.name, axis),
+                    self.__get_rotation_target(bone_name, axis),
+                    utils.to_degrees,
+                    *self.__get_linear_keys(frames, values)))
+
+            self.__export_instance_parameter(
+                pose_bone, animation_clip, "location")
+            self.__export_instance_parameter(
+                pose_bone, animation_clip, "rotation_euler")
+
+        return animations
+
+    def __get_linear_keys(self, frames, values):
+        '''Keys, handles and interpolations of a channel with a linear
+        key on every frame.'''
+        keys = numpy.column_stack((frames, values)).astype(numpy.float32)
+        keys = keys.ravel()
+        return keys, keys, keys, ("LINEAR",) * len(frames)
+
     def __export_instance_animation_parameters(self, object_, animation_clip):
         location_exists = rotation_exists = False
         for curve in object_.animation_data.action.fcurves:
@@ -884,32 +792,36 @@ class CrytekDaeExporter:
                     object_.name, parameter, axis))
             animation_clip.appendChild(inst)
 
+    def __get_location_target(self, bone_name, axis):
+        return "{!s}{!s}{!s}".format(bone_name, "/translation.", axis)
+
+    def __get_rotation_target(self, bone_name, axis):
+        return "{!s}{!s}{!s}{!s}".format(bone_name,
+                                         "/rotation_",
+                                         axis,
+                                         ".ANGLE")
+
     def __get_animation_location(self, object_, bone_name, axis):
         attribute_type = "location"
         multiplier = 1
-        target = "{!s}{!s}{!s}".format(bone_name, "/translation.", axis)
+        target = self.__get_location_target(bone_name, axis)
 
-        animation_element = self.__get_animation_attribute(object_,
-                                                           axis,
-                                                           attribute_type,
-                                                           multiplier,
-                                                           target)
-        return animation_element
+        return self.__get_animation_attribute(object_,
+                                              axis,
+                                              attribute_type,
+                                              multiplier,
+                                              target)
 
     def __get_animation_rotation(self, object_, bone_name, axis):
         attribute_type = "rotation_euler"
         multiplier = utils.to_degrees
-        target = "{!s}{!s}{!s}{!s}".format(bone_name,
-                                           "/rotation_",
-                                           axis,
-                                           ".ANGLE")
-
-        animation_element = self.__get_animation_attribute(object_,
-                                                           axis,
-                                                           attribute_type,
-                                                           multiplier,
-                                                           target)
-        return animation_element
+        target = self.__get_rotation_target(bone_name, axis)
+
+        return self.__get_animation_attribute(object_,
+                                              axis,
+                                              attribute_type,
+                                              multiplier,
+                                              target)
 
     def __get_animation_attribute(self,
                                   object_,
@@ -918,424 +830,208 @@ class CrytekDaeExporter:
                                   multiplier,
                                   target):
         id_prefix = "{!s}_{!s}_{!s}".format(object_.name, attribute_type, axis)
-        source_prefix = "#{!s}".format(id_prefix)
 
         for curve in object_.animation_data.action.fcurves:
             if (curve.data_path ==
                     attribute_type and curve.array_index == AXES[axis]):
                 keyframe_points = curve.keyframe_points
-                sources = {
-                    "input": [],
-                    "output": [],
-                    "interpolation": [],
-                    "intangent": [],
-                    "outangent": []
-                }
-                for keyframe_point in keyframe_points:
-                    khlx = keyframe_point.handle_left[0]
-                    khly = keyframe_point.handle_left[1]
-                    khrx = keyframe_point.handle_right[0]
-                    khry = keyframe_point.handle_right[1]
-                    frame, value = keyframe_point.co
-
-                    sources["input"].append(utils.frame_to_time(frame))
-                    sources["output"].append(value * multiplier)
-                    sources["interpolation"].append(
-                        keyframe_point.interpolation)
-                    sources["intangent"].extend(
-                        [utils.frame_to_time(khlx), khly])
-                    sources["outangent"].extend(
-                        [utils.frame_to_time(khrx), khry])
-
-                animation_element = self.__doc.createElement("animation")
-                animation_element.setAttribute("id", id_prefix)
-
-                for type_, data in sources.items():
-                    anim_node = self.__create_animation_node(
-                        type_, data, id_prefix)
-                    animation_element.appendChild(anim_node)
-
-                sampler = self.__create_sampler(id_prefix, source_prefix)
-                channel = self.__doc.createElement("channel")
-                channel.setAttribute(
-                    "source", "{!s}-sampler".format(source_prefix))
-                channel.setAttribute("target", target)
-
-                animation_element.appendChild(sampler)
-                animation_element.appendChild(channel)
-
-                return animation_element
-
-    def __create_animation_node(self, type_, data, id_prefix):
-        id_ = "{!s}-{!s}".format(id_prefix, type_)
-        type_map = {
-            "input": ["float", ["TIME"]],
-            "output": ["float", ["VALUE"]],
-            "intangent": ["float", "XY"],
-            "outangent": ["float", "XY"],
-            "interpolation": ["name", ["INTERPOLATION"]]
-        }
-
-        source = utils.write_source(
-            id_, type_map[type_][0], data, type_map[type_][1])
-
-        return source
-
-    def __create_sampler(self, id_prefix, source_prefix):
-        sampler = self.__doc.createElement("sampler")
-        sampler.setAttribute("id", "{!s}-sampler".format(id_prefix))
-
-        input = self.__doc.createElement("input")
-        input.setAttribute("semantic", "INPUT")
-        input.setAttribute("source", "{!s}-input".format(source_prefix))
-        output = self.__doc.createElement("input")
-        output.setAttribute("semantic", "OUTPUT")
-        output.setAttribute("source", "{!s}-output".format(source_prefix))
-        interpolation = self.__doc.createElement("input")
-        interpolation.setAttribute("semantic", "INTERPOLATION")
-        interpolation.setAttribute(
-            "source", "{!s}-interpolation".format(source_prefix))
-        intangent = self.__doc.createElement("input")
-        intangent.setAttribute("semantic", "IN_TANGENT")
-        intangent.setAttribute(
-            "source", "{!s}-intangent".format(source_prefix))
-        outangent = self.__doc.createElement("input")
-        outangent.setAttribute("semantic", "OUT_TANGENT")
-        outangent.setAttribute(
-            "source", "{!s}-outangent".format(source_prefix))
-
-        sampler.appendChild(input)
-        sampler.appendChild(output)
-        sampler.appendChild(interpolation)
-        sampler.appendChild(intangent)
-        sampler.appendChild(outangent)
-
-        return sampler
+                keys = [meshdata.read_attribute(keyframe_points, name, 2)
+                        for name in ("co", "handle_left", "handle_right")]
+                interpolations = tuple(keyframe_point.interpolation
+                                       for keyframe_point in keyframe_points)
+
+                return self.__create_animation(
+                    id_prefix, target, multiplier, keys[0], keys[1], keys[2],
+                    interpolations)
+
+    def __create_animation(self, id_, target, multiplier, keys, handles_left,
+                           handles_right, interpolations):
+        render = bpy.context.scene.render
+        animation = ir.Animation(
+            id_, target, multiplier, render.fps, render.fps_base, keys,
+            handles_left, handles_right, interpolations)
+        key = self.__get_cache_key(
+            "animation", ANIMATION_OPTIONS, id_, target, multiplier,
+            render.fps, render.fps_base, interpolations, keys.tobytes(),
+            handles_left.tobytes(), handles_right.tobytes())
+
+        return key, animation
 
 # ---------------------------------------------------------------------
 # Library Visual Scene: --> Skeleton and _Phys bones, Bone
 #       Transformations, and Instance URL (_boneGeometry) and extras.
 # ---------------------------------------------------------------------
 
-    def __export_library_visual_scenes(self, parent_element):
+    def __export_library_visual_scenes(self, writer):
         current_element = self.__doc.createElement("library_visual_scenes")
         visual_scene = self.__doc.createElement("visual_scene")
         visual_scene.setAttribute("id", "scene")
         visual_scene.setAttribute("name", "scene")
-        current_element.appendChild(visual_scene)
-        parent_element.appendChild(current_element)
 
-        if utils.get_export_nodes(self.__config.export_selected_nodes):
+        with writer.element(current_element), writer.element(visual_scene):
             if utils.are_duplicate_nodes():
                 message = "Duplicate Node Names"
-                bpy.ops.screen.display_error('INVOKE_DEFAULT', message=message)
+                bpy.ops.screen.display_error(
+                    'INVOKE_DEFAULT', message=message)
 
             for group in utils.get_export_nodes(
-                    self.__config.export_selected_nodes):
-                self.__write_export_node(group, visual_scene)
-        else:
-            pass  # TODO: Handle No Export Nodes Error
+                    self.__config.export_selected_nodes,
+                    self.__config.export_dirty_nodes):
+                self.__write_export_node(group, writer)
 
-    def __write_export_node(self, group, visual_scene):
+    def __write_export_node(self, group, writer):
+        node_name = utils.get_node_name(group)
         if not self.__config.export_for_lumberyard:
-            node_name = "CryExportNode_{}".format(utils.get_node_name(group))
-            node = self.__doc.createElement("node")
-            node.setAttribute("id", node_name)
-            node.setIdAttribute("id")
+            attributes = (("id", "CryExportNode_{}".format(node_name)),)
         else:
-            node_name = "{}".format(utils.get_node_name(group))
-            node = self.__doc.createElement("node")
-            node.setAttribute("id", node_name)
-            node.setAttribute("LumberyardExportNode", "1")
-            node.setIdAttribute("id")
-
-        bpy.ops.mesh.primitive_cube_add(location=(0, 0, 0))
-        self.__write_transforms(bpy.context.active_object, node)
-        bpy.ops.object.delete(use_global=False)
+            attributes = (("id", node_name), ("LumberyardExportNode", "1"))
 
         root_objects = []
         for object_ in group.objects:
             if (object_.parent is None or object_.type == 'MESH') and \
                     not utils.is_bone_geometry(object_):
                 root_objects.append(object_)
-        node = self.__write_visual_scene_node(root_objects, node)
 
-        extra = self.__create_cryengine_extra(group)
-        node.appendChild(extra)
-        visual_scene.appendChild(node)
+        node = ir.Node(attributes, (0.0, 0.0, 0.0),
+                       extra=self.__get_cryengine_extra(group),
+                       children=self.__get_object_nodes(root_objects))
+        writer.append(elements.write_node(node, self.__job_config))
 
-    def __write_visual_scene_node(self, objects, parent_node):
+    def __get_object_nodes(self, objects):
+        nodes = []
         for object_ in objects:
             if object_.type == "MESH" and not utils.is_fakebone(object_):
-                node = self.__doc.createElement("node")
-                node.setAttribute("id", object_.name)
-                node.setIdAttribute("id")
-
-                self.__write_transforms(object_, node)
-
-                instance = self.__create_instance(object_)
-                if instance is not None:
-                    node.appendChild(instance)
-
-                extra = self.__create_cryengine_extra(object_)
-                if extra is not None:
-                    node.appendChild(extra)
-
-                parent_node.appendChild(node)
-
-                if object_.parent is not None and object_.parent.type == "ARMATURE":
-                    self.__write_bone_list(
-                        [utils.get_root_bone(object_.parent)], object_, parent_node)
+                animated = bool(
+                    object_.animation_data and object_.animation_data.action)
+                nodes.append(ir.Node(
+                    (("id", object_.name),),
+                    tuple(object_.location), tuple(object_.rotation_euler),
+                    tuple(object_.scale), animated,
+                    self.__get_instance(object_),
+                    self.__get_cryengine_extra(object_)))
+
+                if object_.parent is not None and \
+                        object_.parent.type == "ARMATURE":
+                    nodes.extend(self.__get_bone_nodes(
+                        [utils.get_root_bone(object_.parent)], object_))
 
             elif object_.type == "ARMATURE" and utils.is_physical(object_):
-                self.__write_bone_list(
-                    [utils.get_root_bone(object_)], object_, parent_node)
-
-        return parent_node
+                nodes.extend(self.__get_bone_nodes(
+                    [utils.get_root_bone(object_)], object_))
 
-    def __write_bone_list(self, bones, object_, parent_node):
-        scene = bpy.context.scene
-        bone_names = []
+        return nodes
 
+    def __get_bone_nodes(self, bones, object_):
+        nodes = []
         node_name = utils.get_armature_node_name(object_)
 
         for bone in bones:
             props_name = self.__create_props_bone_name(bone, node_name)
             props_ik = self.__create_ik_properties(bone, object_)
             bone_name = join(bone.name, props_name, props_ik)
-            bone_names.append(bone_name)
 
-            node = self.__doc.createElement("node")
-            node.setAttribute("id", bone_name)
-            node.setAttribute("name", bone_name)
-            node.setIdAttribute("id")
-
-            fakebone = utils.get_fakebone(bone.name)
-            if fakebone is not None:
-                self.__write_transforms(fakebone, node)
+            node = ir.Node((("id", bone_name), ("name", bone_name)),
+                           (0.0, 0.0, 0.0))
+
+            if object_.type == "MESH":
+                transforms = self.__bone_transforms.get(
+                    object_.parent.name, {})
+                if bone.name in transforms:
+                    location, rotation = transforms[bone.name]
+                    node.location = tuple(map(float, location))
+                    node.rotation = tuple(map(float, rotation))
+                    node.animated = True
+                else:
+                    node.location = tuple(bone.head_local)
 
                 bone_geometry = utils.get_bone_geometry(bone.name)
                 if bone_geometry is not None:
-                    instance = self.__create_instance_for_bone(
+                    node.instance = self.__get_instance_for_bone(
                         bone, bone_geometry)
-                    node.appendChild(instance)
-
-                    extra = self.__create_physic_proxy_for_bone(
+                    node.extra = self.__get_physic_proxy_for_bone(
                         object_.parent, bone)
-                    if extra is not None:
-                        node.appendChild(extra)
 
             elif utils.is_physical(bone):
                 bone_geometry = utils.get_bone_geometry(bone.name)
                 if bone_geometry is not None:
-                    self.__write_transforms(bone_geometry, node)
-
-            parent_node.appendChild(node)
+                    node.location = tuple(bone_geometry.location)
+                    node.rotation = tuple(bone_geometry.rotation_euler)
+                    node.scale = tuple(bone_geometry.scale)
+                    node.animated = bool(
+                        bone_geometry.animation_data and
+                        bone_geometry.animation_data.action)
 
             if bone.children:
-                self.__write_bone_list(bone.children, object_, node)
-
-    def __create_instance_for_bone(self, bone, bone_geometry):
-        instance = None
-
-        instance = self.__doc.createElement("instance_geometry")
-        instance.setAttribute("url", "#{}_boneGeometry".format(bone.name))
-        bm = self.__doc.createElement("bind_material")
-        tc = self.__doc.createElement("technique_common")
-
-        for mat in bone_geometry.material_slots:
-            im = self.__doc.createElement("instance_material")
-            im.setAttribute("symbol", mat.name)
-            im.setAttribute("target", "#{}".format(mat.name))
-            bvi = self.__doc.createElement("bind_vertex_input")
-            bvi.setAttribute("semantic", "UVMap")
-            bvi.setAttribute("input_semantic", "TEXCOORD")
-            bvi.setAttribute("input_set", "0")
-            im.appendChild(bvi)
-            tc.appendChild(im)
-
-        bm.appendChild(tc)
-        instance.appendChild(bm)
-
-        return instance
-
-    def __create_physic_proxy_for_bone(self, object_, bone):
-        extra = None
+                node.children = self.__get_bone_nodes(bone.children, object_)
+            nodes.append(node)
+
+        return nodes
+
+    def __get_instance_for_bone(self, bone, bone_geometry):
+        geometry_id = self.__geometry_ids.get(
+            bone_geometry.name, "{}_boneGeometry".format(bone.name))
+
+        return ir.Instance(
+            "instance_geometry", "#{}".format(geometry_id),
+            tuple(slot.name for slot in bone_geometry.material_slots))
+
+    def __get_physic_proxy_for_bone(self, object_, bone):
         try:
             bonePhys = object_.pose.bones[bone.name]['phys_proxy']
             cbPrint(bone.name + " physic proxy is " + bonePhys)
+        except:
+            return None
 
-            extra = self.__doc.createElement("extra")
-            techcry = self.__doc.createElement("technique")
-            techcry.setAttribute("profile", "CryEngine")
-            prop2 = self.__doc.createElement("properties")
+        return ir.Extra((bonePhys,))
 
-            cryprops = self.__doc.createTextNode(bonePhys)
-            prop2.appendChild(cryprops)
-            techcry.appendChild(prop2)
-            extra.appendChild(techcry)
-        except:
-            pass
-
-        return extra
-
-    def __write_transforms(self, object_, node):
-        trans = self.__create_translation_node(object_)
-        rotx, roty, rotz = self.__create_rotation_node(object_)
-        scale = self.__create_scale_node(object_)
-
-        node.appendChild(trans)
-        node.appendChild(rotx)
-        node.appendChild(roty)
-        node.appendChild(rotz)
-        node.appendChild(scale)
-
-    def __create_translation_node(self, object_):
-        trans = self.__doc.createElement("translate")
-        trans.setAttribute("sid", "translation")
-        trans_text = self.__doc.createTextNode("{:f} {:f} {:f}".format(
-            * object_.location))
-        trans.appendChild(trans_text)
-
-        return trans
-
-    def __create_rotation_node(self, object_):
-        rotx = self.__write_rotation(
-            "X", "1 0 0 {:f}", object_.rotation_euler[0])
-        roty = self.__write_rotation(
-            "Y", "0 1 0 {:f}", object_.rotation_euler[1])
-        rotz = self.__write_rotation(
-            "Z", "0 0 1 {:f}", object_.rotation_euler[2])
-
-        return rotx, roty, rotz
-
-    def __write_rotation(self, axis, textFormat, rotation):
-        rot = self.__doc.createElement("rotate")
-        rot.setAttribute("sid", "rotation_{}".format(axis))
-        rot_text = self.__doc.createTextNode(textFormat.format(
-            rotation * utils.to_degrees))
-        rot.appendChild(rot_text)
-
-        return rot
-
-    def __create_scale_node(self, object_):
-        scale = self.__doc.createElement("scale")
-        scale.setAttribute("sid", "scale")
-        scale_text = self.__doc.createTextNode(
-            utils.floats_to_string(object_.scale, " ", "%s"))
-        scale.appendChild(scale_text)
-
-        return scale
-
-    def __create_instance(self, object_):
+    def __get_instance(self, object_):
         armature = utils.get_armature_for_object(object_)
-        instance = None
         if armature is not None:
-            instance = self.__doc.createElement("instance_controller")
             # This binds the mesh object to the armature in control of it
-            instance.setAttribute("url", "#{!s}_{!s}".format(
-                armature.name,
-                object_.name))
+            tag_name = "instance_controller"
+            url = "#{!s}_{!s}".format(armature.name, object_.name)
         elif object_.name[:6] != "_joint" and object_.type == "MESH":
-            instance = self.__doc.createElement("instance_geometry")
-            instance.setAttribute("url", "#{!s}".format(object_.name))
-
-        if instance is not None:
-            bind_material = self.__create_bind_material(object_)
-            instance.appendChild(bind_material)
-            return instance
-
-    def __create_bind_material(self, object_):
-        bind_material = self.__doc.createElement('bind_material')
-        technique_common = self.__doc.createElement('technique_common')
-
-        for material, materialname in self.__get_materials_for_object(
-                object_).items():
-            instance_material = self.__doc.createElement(
-                'instance_material')
-            instance_material.setAttribute('symbol', materialname)
-            instance_material.setAttribute('target', '#{!s}'.format(
-                materialname))
-
-            bind_vertex_input = self.__doc.createElement(
-                'bind_vertex_input')
-            bind_vertex_input.setAttribute('semantic', 'UVMap')
-            bind_vertex_input.setAttribute('input_semantic', 'TEXCOORD')
-            bind_vertex_input.setAttribute('input_set', '0')
-
-            instance_material.appendChild(bind_vertex_input)
-            technique_common.appendChild(instance_material)
-
-        bind_material.appendChild(technique_common)
+            tag_name = "instance_geometry"
+            url = "#{!s}".format(self.__get_geometry_id(object_))
+        else:
+            return None
 
-        return bind_material
+        material_names = tuple(
+            self.__get_materials_for_object(object_).values())
+        return ir.Instance(tag_name, url, material_names)
 
-    def __create_cryengine_extra(self, node):
-        extra = self.__doc.createElement("extra")
-        technique = self.__doc.createElement("technique")
-        technique.setAttribute("profile", "CryEngine")
-        properties = self.__doc.createElement("properties")
+    def __get_cryengine_extra(self, node):
+        properties = []
 
         ALLOWED_NODE_TYPES = ("cgf", "cga", "chr", "skin", "anm", "i_caf")
 
         if utils.is_export_node(node):
             node_type = utils.get_node_type(node)
             if node_type in ALLOWED_NODE_TYPES:
-                prop = self.__doc.createTextNode(
-                    "fileType={}".format(node_type))
-                properties.appendChild(prop)
+                properties.append("fileType={}".format(node_type))
             if self.__config.do_not_merge:
-                prop = self.__doc.createTextNode("DoNotMerge")
-                properties.appendChild(prop)
+                properties.append("DoNotMerge")
         else:
             if not node.rna_type.id_data.items():
                 return
         for prop in node.rna_type.id_data.items():
-            self.__create_user_defined_property(prop, properties)
-
-        technique.appendChild(properties)
+            self.__get_user_defined_property(prop, properties)
 
+        helper = None
         if (node.name[:6] == "_joint"):
-            helper = self.__create_helper_joint(node)
-            technique.appendChild(helper)
+            helper = tuple(utils.get_bounding_box(node))
 
-        extra.appendChild(technique)
+        return ir.Extra(properties, helper)
 
-        return extra
-
-    def __create_user_defined_property(self, prop, node):
+    def __get_user_defined_property(self, prop, properties):
         if prop:
             prop_name = prop[0]
             if add.is_user_defined_property(prop_name):
-                udp = None
-
                 if isinstance(prop[1], str):
-                    udp = self.__doc.createTextNode("{!s}".format(prop[1]))
+                    properties.append("{!s}".format(prop[1]))
                 else:
-                    udp = self.__doc.createTextNode("{!s}=".format(prop[0])
-                                                    + "{!s}".format(prop[1]))
-
-                node.appendChild(udp)
-
-    def __create_helper_joint(self, object_):
-        x1, y1, z1, x2, y2, z2 = utils.get_bounding_box(object_)
-
-        min = self.__doc.createElement("bound_box_min")
-        min_text = self.__doc.createTextNode(
-            "{:f} {:f} {:f}".format(x1, y1, z1))
-        min.appendChild(min_text)
-
-        max = self.__doc.createElement("bound_box_max")
-        max_text = self.__doc.createTextNode(
-            "{:f} {:f} {:f}".format(x2, y2, z2))
-        max.appendChild(max_text)
-
-        joint = self.__doc.createElement("helper")
-        joint.setAttribute("type", "dummy")
-        joint.appendChild(min)
-        joint.appendChild(max)
-
-        return joint
+                    properties.append("{!s}=".format(prop[0]) +
+                                      "{!s}".format(prop[1]))
 
     def __create_props_bone_name(self, bone, node_name):
         bone_name = bone.name.replace("__", "*")
@@ -1374,13 +1070,13 @@ class CrytekDaeExporter:
 
         return props
 
-    def __export_scene(self, parent_element):
+    def __export_scene(self, writer):
         scene = self.__doc.createElement("scene")
         instance_visual_scene = self.__doc.createElement(
             "instance_visual_scene")
         instance_visual_scene.setAttribute("url", "#scene")
         scene.appendChild(instance_visual_scene)
-        parent_element.appendChild(scene)
+        writer.append(scene)
 
 
 def write_scripts(config):
@@ -1391,7 +1087,8 @@ def write_scripts(config):
     dae_path = utils.get_absolute_path_for_rc(filepath)
     output_path = os.path.dirname(dae_path)
     chr_names = []
-    for group in utils.get_export_nodes(self.__config.export_selected_nodes):
+    for group in utils.get_export_nodes(config.export_selected_nodes,
+                                        config.export_dirty_nodes):
         if utils.get_node_type(group) == "chr":
             chr_names.append(utils.get_node_name(group))
 
@@ -1411,8 +1108,21 @@ def save(config):
     if not config.disable_rc and not os.path.isfile(config.rc_path):
         raise exceptions.NoRcSelectedException
 
+    groups = utils.get_export_nodes(config.export_selected_nodes,
+                                    config.export_dirty_nodes)
+    # An empty DAE file would make RC overwrite the exported files.
+    if not groups:
+        if config.export_dirty_nodes:
+            cbPrint("No export node changed, nothing to export.", 'warning')
+        else:
+            cbPrint("No export nodes found, nothing to export.", 'warning')
+        return
+
+    # The flags are only cleared once RC converted the file.
+    token = dirty.begin_export(groups)
     exporter = CrytekDaeExporter(config)
-    exporter.export()
+    with dirty.ignore_updates(groups):
+        exporter.export(lambda: dirty.mark_converted(token))
 
 
 def register():
@@ -0,0 +1,85 @@
+#------------------------------------------------------------------------------
+# Name:        formatting.py
+# Purpose:     Bulk conversion of numeric arrays to COLLADA text
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+
+import re
+
+
+DEFAULT_PRECISION = 6
+CHUNK_SIZE = 65536
+
+__TRAILING_ZEROS = re.compile(r"(\.\d*?[1-9])0+(?!\d)")
+__ZERO_FRACTION = re.compile(r"\.0+(?!\d)")
+__NEGATIVE_ZERO = re.compile(r"(?<![\d.])-0(?![\d.])")
+__formats = {}
+
+
+def iter_floats(values, precision=DEFAULT_PRECISION, trim=False,
+                separator=" ", chunk_size=CHUNK_SIZE):
+    '''Yield the text of a flat float sequence in chunks.
+
+    Every chunk is formatted with a single % operation on a format string
+    that is built once per length, instead of formatting each value on
+    its own. With trim, trailing zeros of the fraction are dropped.
+    '''
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+
+    for start in range(0, len(values), chunk_size):
+        chunk = tuple(values[start:start + chunk_size])
+        text = __get_format(len(chunk), precision, separator) % chunk
+        if trim:
+            text = trim_zeros(text)
+        if start:
+            text = separator + text
+
+        yield text
+
+
+def iter_ints(values, separator=" ", chunk_size=CHUNK_SIZE):
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+
+    for start in range(0, len(values), chunk_size):
+        text = separator.join(map(str, values[start:start + chunk_size]))
+        if start:
+            text = separator + text
+
+        yield text
+
+
+def format_floats(values, precision=DEFAULT_PRECISION, trim=False,
+                  separator=" "):
+    return "".join(iter_floats(values, precision, trim, separator))
+
+
+def trim_zeros(text):
+    '''Drop trailing zeros of fixed point numbers: "1.500 -0.000" becomes
+    "1.5 0".
+    '''
+    text = __TRAILING_ZEROS.sub(r"\1", text)
+    text = __ZERO_FRACTION.sub("", text)
+    return __NEGATIVE_ZERO.sub("0", text)
+
+
+def __get_format(length, precision, separator):
+    key = (length, precision, separator)
+    try:
+        return __formats[key]
+    except KeyError:
+        if len(__formats) > 64:
+            __formats.clear()
+
+        format_ = separator.join(["%.{:d}f".format(precision)] * length)
+        __formats[key] = format_
+        return format_
@@ -0,0 +1,165 @@
+#------------------------------------------------------------------------------
+# Name:        ir.py
+# Purpose:     Snapshot of the scene data written to the DAE file
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+'''The exporter extracts these records from Blender, and elements.py writes
+them without touching bpy. Bulk data is kept in NumPy arrays, so records
+can be handed to other processes and writers can run outside Blender.
+'''
+
+
+class Material:
+    '''Effect of one exported material. Colors are RGBA tuples, images
+    hold the diffuse, specular and normal map image names or None.
+    '''
+    __slots__ = (
+        "name",
+        "emission",
+        "ambient",
+        "diffuse",
+        "specular",
+        "shininess",
+        "index_refraction",
+        "images",
+    )
+
+    def __init__(self, name, emission, ambient, diffuse, specular,
+                 shininess, index_refraction, images):
+        self.name = name
+        self.emission = emission
+        self.ambient = ambient
+        self.diffuse = diffuse
+        self.specular = specular
+        self.shininess = shininess
+        self.index_refraction = index_refraction
+        self.images = images
+
+
+class Geometry:
+    '''Mesh of one object as meshdata.MeshBuffers, with the names of the
+    materials its material indices refer to.
+    '''
+    __slots__ = ("id", "material_names", "buffers")
+
+    def __init__(self, id_, material_names, buffers):
+        self.id = id_
+        self.material_names = material_names
+        self.buffers = buffers
+
+
+class Skin:
+    '''Skin controller of one object. Every vertex has influence_counts
+    entries in joints and weights, and bind_matrices holds the 16 floats
+    of every joint's inverse bind matrix.
+    '''
+    __slots__ = (
+        "id",
+        "geometry_id",
+        "joint_names",
+        "bind_matrices",
+        "influence_counts",
+        "joints",
+        "weights",
+    )
+
+    def __init__(self, id_, geometry_id, joint_names, bind_matrices,
+                 influence_counts, joints, weights):
+        self.id = id_
+        self.geometry_id = geometry_id
+        self.joint_names = joint_names
+        self.bind_matrices = bind_matrices
+        self.influence_counts = influence_counts
+        self.joints = joints
+        self.weights = weights
+
+
+class Animation:
+    '''One animated channel. Keys, left and right handles are (frame,
+    value) pairs. Frames are converted to seconds with the scene fps and
+    fps_base, and multiplier converts values to DAE units.
+    '''
+    __slots__ = (
+        "id",
+        "target",
+        "multiplier",
+        "fps",
+        "fps_base",
+        "keys",
+        "handles_left",
+        "handles_right",
+        "interpolations",
+    )
+
+    def __init__(self, id_, target, multiplier, fps, fps_base, keys,
+                 handles_left, handles_right, interpolations):
+        self.id = id_
+        self.target = target
+        self.multiplier = multiplier
+        self.fps = fps
+        self.fps_base = fps_base
+        self.keys = keys
+        self.handles_left = handles_left
+        self.handles_right = handles_right
+        self.interpolations = interpolations
+
+
+class Node:
+    '''Node of the visual scene. location, rotation as XYZ Euler angles in
+    radians and scale give its transform, which animated nodes write as
+    separate elements for the channels to target. attributes are the
+    (name, value) pairs of the element.
+    '''
+    __slots__ = (
+        "attributes",
+        "location",
+        "rotation",
+        "scale",
+        "animated",
+        "instance",
+        "extra",
+        "children",
+    )
+
+    def __init__(self, attributes, location, rotation=(0.0, 0.0, 0.0),
+                 scale=(1.0, 1.0, 1.0), animated=False, instance=None,
+                 extra=None, children=()):
+        self.attributes = attributes
+        self.location = location
+        self.rotation = rotation
+        self.scale = scale
+        self.animated = animated
+        self.instance = instance
+        self.extra = extra
+        self.children = children
+
+
+class Instance:
+    '''Instance of a geometry or controller in a node, tag_name tells
+    which. Every material name is bound to the material of that name.
+    '''
+    __slots__ = ("tag_name", "url", "material_names")
+
+    def __init__(self, tag_name, url, material_names):
+        self.tag_name = tag_name
+        self.url = url
+        self.material_names = material_names
+
+
+class Extra:
+    '''CryEngine properties of a node, one string each, and the bounding
+    box of a helper as (min x, y, z, max x, y, z) or None.
+    '''
+    __slots__ = ("properties", "helper")
+
+    def __init__(self, properties, helper=None):
+        self.properties = properties
+        self.helper = helper
@@ -0,0 +1,481 @@
+#------------------------------------------------------------------------------
+# Name:        meshdata.py
+# Purpose:     Bulk extraction of mesh attributes into flat typed buffers
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+
+import hashlib
+import math
+import numpy
+
+
+PLANAR_TOLERANCE = .052
+MAX_INFLUENCES = 8
+
+
+def read_attribute(collection, attribute, size=1, dtype=numpy.float32):
+    '''Read one attribute of every item in a bpy collection at once.'''
+    buffer = numpy.empty(len(collection) * size, dtype=dtype)
+    if len(buffer):
+        collection.foreach_get(attribute, buffer)
+
+    return buffer
+
+
+def read_vertex_groups(mesh):
+    '''Read the vertex group index and weight of every vertex group
+    element, in vertex order, and the number of elements per vertex.
+    '''
+    vertices = mesh.vertices
+    counts = numpy.empty(len(vertices), numpy.int32)
+
+    def iter_elements():
+        # Counts are filled in on the way, so the vertices are walked once.
+        for index, vertex in enumerate(vertices):
+            groups = vertex.groups
+            counts[index] = len(groups)
+            for element in groups:
+                yield element.group
+                yield element.weight
+
+    # Group indices are exact in float64, so both go into one buffer.
+    values = numpy.fromiter(iter_elements(), numpy.float64).reshape(-1, 2)
+    groups = values[:, 0].astype(numpy.int32)
+    weights = values[:, 1].astype(numpy.float32)
+
+    return counts, groups, weights
+
+
+class MeshBuffers:
+    '''Snapshot of the mesh data needed by the geometry writers.
+
+    Polygons are triangulated by the exporter. Every triangle corner
+    refers to a loop, and per-loop data (UVs, colors, normal indices) is
+    looked up through it.
+    '''
+
+    def __init__(self, mesh, tangents=False):
+        self.vertex_count = len(mesh.vertices)
+        self.polygon_count = len(mesh.polygons)
+
+        self.positions = read_attribute(mesh.vertices, "co", 3)
+        self.vertex_normals = read_attribute(mesh.vertices, "normal", 3)
+
+        self.polygon_normals = read_attribute(mesh.polygons, "normal", 3)
+        self.polygon_smooth = read_attribute(
+            mesh.polygons, "use_smooth", 1, numpy.bool_)
+        self.polygon_materials = read_attribute(
+            mesh.polygons, "material_index", 1, numpy.int32)
+        self.__loop_starts = read_attribute(
+            mesh.polygons, "loop_start", 1, numpy.int32)
+        self.__loop_totals = read_attribute(
+            mesh.polygons, "loop_total", 1, numpy.int32)
+
+        self.loop_vertices = read_attribute(
+            mesh.loops, "vertex_index", 1, numpy.int32)
+        self.loop_polygons = numpy.empty(len(mesh.loops), numpy.int32)
+        self.loop_polygons[self.__get_polygon_loops()] = numpy.repeat(
+            numpy.arange(self.polygon_count), self.__loop_totals)
+
+        if hasattr(mesh, "loop_triangles"):
+            mesh.calc_loop_triangles()
+            triangle_loops = read_attribute(
+                mesh.loop_triangles, "loops", 3, numpy.int32)
+            self.triangle_polygons = read_attribute(
+                mesh.loop_triangles, "polygon_index", 1, numpy.int32)
+        else:
+            triangle_loops, self.triangle_polygons = triangulate(
+                self.positions.reshape(-1, 3),
+                self.polygon_normals.reshape(-1, 3),
+                self.loop_vertices,
+                self.__loop_starts,
+                self.__loop_totals)
+
+        self.corner_loops = triangle_loops.ravel()
+        self.corner_vertices = self.loop_vertices[self.corner_loops]
+
+        self.uv_layers = []
+        for uv_layer in mesh.uv_layers:
+            uvs = read_attribute(uv_layer.data, "uv", 2)
+            self.uv_layers.append((uv_layer.name, uvs))
+
+        self.color_layers = []
+        for color_layer in mesh.vertex_colors:
+            size = len(color_layer.data[0].color) if color_layer.data else 3
+            colors = read_attribute(color_layer.data, "color", size)
+            colors = colors.reshape(-1, size)[:, :3].ravel()
+            self.color_layers.append((color_layer.name, colors))
+
+        self.tangents = self.bitangents = None
+        if tangents and mesh.uv_layers:
+            self.__read_tangents(mesh)
+
+    @property
+    def loop_count(self):
+        return len(self.loop_vertices)
+
+    @property
+    def triangle_count(self):
+        return len(self.triangle_polygons)
+
+    @property
+    def corner_count(self):
+        return len(self.corner_loops)
+
+    def get_hash(self):
+        '''Return a digest that is equal for meshes with identical content.'''
+        digest = hashlib.sha1()
+        buffers = [("positions", self.positions),
+                   ("vertex_normals", self.vertex_normals),
+                   ("polygon_normals", self.polygon_normals),
+                   ("polygon_smooth", self.polygon_smooth),
+                   ("polygon_materials", self.polygon_materials),
+                   ("loop_vertices", self.loop_vertices),
+                   ("corner_loops", self.corner_loops)]
+        buffers.extend(self.uv_layers)
+        buffers.extend(self.color_layers)
+        if self.tangents is not None:
+            buffers.append(("tangents", self.tangents))
+            buffers.append(("bitangents", self.bitangents))
+
+        for name, buffer in buffers:
+            digest.update("{}:{:d}:".format(name, len(buffer)).encode())
+            digest.update(numpy.ascontiguousarray(buffer))
+
+        return digest.hexdigest()
+
+    def get_normals(self, polygon_normals):
+        '''Return vertex normals for every loop of smooth polygons and one
+        polygon normal for each flat polygon, in loop order, together with
+        the normal index of every loop.
+        '''
+        loop_smooth = self.polygon_smooth[self.loop_polygons]
+
+        written = loop_smooth.copy()
+        written[self.__loop_starts[~self.polygon_smooth]] = True
+
+        vertex_normals = self.vertex_normals.reshape(-1, 3)
+        normals = numpy.where(loop_smooth[:, None],
+                              vertex_normals[self.loop_vertices],
+                              polygon_normals[self.loop_polygons])
+        indices = numpy.cumsum(written) - 1
+
+        return normals[written].ravel(), indices
+
+    def get_colors(self):
+        '''Merge the color layers into one stream with an entry per loop.
+
+        The first color layer gives RGB. A layer named "alpha" is reduced
+        to the mean of its channels and appended as A, with white RGB if
+        there is no other layer. Returns the colors and their params, or
+        None if the mesh has no colors.
+        '''
+        rgb = alpha = None
+        for name, colors in self.color_layers:
+            if name.lower() == "alpha":
+                if alpha is None:
+                    alpha = colors.reshape(-1, 3).mean(1)
+            elif rgb is None:
+                rgb = colors.reshape(-1, 3)
+
+        if alpha is None:
+            if rgb is None:
+                return None
+            return rgb.ravel(), "RGB"
+
+        rgba = numpy.ones((self.loop_count, 4), numpy.float32)
+        if rgb is not None:
+            rgba[:, :3] = rgb
+        rgba[:, 3] = alpha
+
+        return rgba.ravel(), "RGBA"
+
+    def group_by_material(self):
+        '''Yield the material index, face sizes and corner indices of the
+        triangles using each material, bucketed in a single pass.
+        '''
+        triangle_materials = self.polygon_materials[self.triangle_polygons]
+        order = numpy.argsort(triangle_materials, kind="mergesort")
+        triangle_materials = triangle_materials[order]
+
+        materials = numpy.unique(triangle_materials)
+        bounds = numpy.searchsorted(
+            triangle_materials, numpy.append(materials, materials[-1:] + 1))
+
+        corners = (order[:, None] * 3 + numpy.arange(3)).ravel()
+        for index, material in enumerate(materials.tolist()):
+            start = bounds[index]
+            end = bounds[index + 1]
+            face_sizes = numpy.empty(end - start, numpy.int32)
+            face_sizes.fill(3)
+            yield material, face_sizes, corners[start * 3:end * 3]
+
+    def __read_tangents(self, mesh):
+        '''Read MikkTSpace tangents computed for the first UV layer.'''
+        try:
+            mesh.calc_tangents(uvmap=mesh.uv_layers[0].name)
+        except (AttributeError, RuntimeError):
+            # Blender before 2.74, or a mesh MikkTSpace cannot handle.
+            return
+
+        try:
+            self.tangents = read_attribute(mesh.loops, "tangent", 3)
+            self.bitangents = read_attribute(mesh.loops, "bitangent", 3)
+        finally:
+            mesh.free_tangents()
+
+    def __get_polygon_loops(self):
+        '''Return the loop indices of all polygons, in polygon order.'''
+        offsets = numpy.cumsum(self.__loop_totals) - self.__loop_totals
+        return (numpy.repeat(self.__loop_starts - offsets,
+                             self.__loop_totals) +
+                numpy.arange(self.__loop_totals.sum()))
+
+
+def triangulate(positions, polygon_normals, loop_vertices, loop_starts,
+                loop_totals):
+    '''Split polygons into triangles of loop indices.
+
+    Returns the loops of every triangle and the polygon it comes from.
+    Quads are split along the diagonal that keeps both halves facing the
+    polygon normal, larger polygons are handed to mathutils.
+    '''
+    triangle_loops = [numpy.empty((0, 3), numpy.int32)]
+    triangle_polygons = [numpy.empty(0, numpy.int32)]
+
+    triangles = numpy.flatnonzero(loop_totals == 3)
+    triangle_loops.append(loop_starts[triangles, None] + numpy.arange(3))
+    triangle_polygons.append(triangles)
+
+    quads = numpy.flatnonzero(loop_totals == 4)
+    if len(quads):
+        loops = loop_starts[quads, None] + numpy.arange(4)
+        co = positions[loop_vertices[loops]]
+        normals = polygon_normals[quads]
+
+        diagonal = co[:, 2] - co[:, 0]
+        first = (numpy.cross(co[:, 1] - co[:, 0], diagonal) * normals).sum(1)
+        second = (numpy.cross(diagonal, co[:, 3] - co[:, 0]) * normals).sum(1)
+        split_0_2 = ((first >= 0) & (second >= 0))[:, None]
+
+        first_half = numpy.where(
+            split_0_2, loops[:, [0, 1, 2]], loops[:, [1, 2, 3]])
+        second_half = numpy.where(
+            split_0_2, loops[:, [0, 2, 3]], loops[:, [1, 3, 0]])
+        triangle_loops.extend((first_half, second_half))
+        triangle_polygons.extend((quads, quads))
+
+    ngons = numpy.flatnonzero(loop_totals > 4)
+    if len(ngons):
+        loops, polygons = __triangulate_ngons(
+            positions, polygon_normals, loop_vertices,
+            loop_starts, loop_totals, ngons)
+        triangle_loops.append(loops)
+        triangle_polygons.append(polygons)
+
+    triangle_loops = numpy.concatenate(triangle_loops).astype(numpy.int32)
+    triangle_polygons = numpy.concatenate(
+        triangle_polygons).astype(numpy.int32)
+
+    order = numpy.argsort(triangle_polygons, kind="mergesort")
+    return triangle_loops[order], triangle_polygons[order]
+
+
+def __triangulate_ngons(positions, polygon_normals, loop_vertices,
+                        loop_starts, loop_totals, polygons):
+    from mathutils.geometry import tessellate_polygon
+
+    triangle_loops = []
+    triangle_polygons = []
+    for polygon in polygons.tolist():
+        start = loop_starts[polygon]
+        loops = numpy.arange(start, start + loop_totals[polygon])
+        outline = positions[loop_vertices[loops]].tolist()
+        for triangle in tessellate_polygon([outline]):
+            triangle_loops.append(loops[list(triangle)])
+            triangle_polygons.append(polygon)
+
+    triangle_loops = numpy.array(triangle_loops).reshape(-1, 3)
+    triangle_polygons = numpy.array(triangle_polygons, numpy.intp)
+
+    # The fill does not keep the winding, so flip triangles facing away.
+    co = positions[loop_vertices[triangle_loops]]
+    facing = (numpy.cross(co[:, 1] - co[:, 0], co[:, 2] - co[:, 0]) *
+              polygon_normals[triangle_polygons]).sum(1)
+    triangle_loops[facing < 0] = triangle_loops[facing < 0][:, [0, 2, 1]]
+
+    return triangle_loops, triangle_polygons
+
+
+def unique_rows(values):
+    '''Return the distinct rows of a 2D array and, for every input row,
+    the index of its distinct row.
+    '''
+    order = numpy.lexsort(values.T[::-1])
+    sorted_values = values[order]
+
+    first = numpy.ones(len(values), numpy.bool_)
+    first[1:] = (sorted_values[1:] != sorted_values[:-1]).any(1)
+
+    inverse = numpy.empty(len(values), numpy.intp)
+    inverse[order] = numpy.cumsum(first) - 1
+
+    return sorted_values[first], inverse
+
+
+def weld(values, size, epsilon=0.0):
+    '''Collapse duplicate attribute tuples of a flat array.
+
+    Returns the distinct tuples as a flat array and the index of the
+    distinct tuple for each input tuple. With a non-zero epsilon, tuples
+    that quantize to the same grid cell are merged and represented by the
+    first of them.
+    '''
+    rows = values.reshape(-1, size)
+    if not epsilon:
+        unique, inverse = unique_rows(rows)
+        return unique.ravel(), inverse
+
+    keys = numpy.round(rows / epsilon).astype(numpy.int64)
+    unique, inverse = unique_rows(keys)
+
+    first = numpy.empty(len(unique), numpy.intp)
+    first[inverse[::-1]] = numpy.arange(len(rows))[::-1]
+
+    return rows[first].ravel(), inverse
+
+
+def get_influences(counts, groups, weights, bone_ids):
+    '''Turn vertex group elements into skin influences.
+
+    bone_ids maps vertex group indices to joint indices, or to -1 for
+    groups of no bone. Elements of other groups or with zero weight are
+    dropped. Returns the influence count of every vertex and the joint
+    and weight arrays.
+    '''
+    vertices = numpy.repeat(numpy.arange(len(counts)), counts)
+    joints = numpy.asarray(bone_ids, numpy.int32)[groups]
+
+    keep = (joints >= 0) & (weights != 0)
+    counts = numpy.bincount(vertices[keep], minlength=len(counts))
+
+    return counts.astype(numpy.int32), joints[keep], weights[keep]
+
+
+def condition_influences(counts, joints, weights,
+                         max_influences=MAX_INFLUENCES, threshold=0.0,
+                         normalize=False, quantize=False):
+    '''Keep the max_influences heaviest influences of every vertex and
+    drop those lighter than threshold, though never the heaviest one.
+
+    With normalize the weights of each vertex add up to one. With
+    quantize they are rounded to multiples of 1/255, and influences that
+    round to zero are dropped. Returns the new counts, joints and weights
+    with the influences of each vertex ordered heaviest first.
+    '''
+    vertex_count = len(counts)
+    vertices = numpy.repeat(numpy.arange(vertex_count), counts)
+    order = numpy.lexsort((-weights, vertices))
+    vertices = vertices[order]
+    joints = joints[order]
+    weights = weights[order].astype(numpy.float64)
+
+    ranks = __get_ranks(vertices, vertex_count)
+    keep = (ranks < max_influences) & ((weights >= threshold) | (ranks == 0))
+
+    if normalize:
+        sums = numpy.bincount(vertices[keep], weights[keep], vertex_count)
+        weights /= numpy.where(sums > 0, sums, 1.0)[vertices]
+
+    if quantize:
+        steps = numpy.round(weights * 255.0)
+        keep &= (steps > 0) | (ranks == 0)
+        if normalize:
+            # The heaviest influence takes the rounding error, so the
+            # weights still add up to exactly one.
+            errors = 255 - numpy.bincount(
+                vertices[keep], steps[keep], vertex_count)
+            heaviest = keep & (ranks == 0)
+            steps[heaviest] += errors[vertices[heaviest]]
+        weights = steps / 255.0
+
+    counts = numpy.bincount(vertices[keep], minlength=vertex_count)
+
+    return (counts.astype(numpy.int32), joints[keep],
+            weights[keep].astype(numpy.float32))
+
+
+def __get_ranks(vertices, vertex_count):
+    '''Position of every element within its vertex. Elements of a vertex
+    must be adjacent.'''
+    counts = numpy.bincount(vertices, minlength=vertex_count)
+    starts = numpy.cumsum(counts) - counts
+
+    return numpy.arange(len(vertices)) - starts[vertices]
+
+
+def average_planar_normals(face_normals, faces, tolerance=PLANAR_TOLERANCE,
+                           chunk_size=1024):
+    '''Average the normal of each selected face with all face normals
+    that lie within the angular tolerance of it.
+
+    Normals are bucketed on a grid with cells as wide as the tolerance, so
+    every normal is only compared against the 27 cells around its own.
+    '''
+    averaged = face_normals.copy()
+    if not faces.any():
+        return averaged
+
+    normals, inverse = unique_rows(face_normals)
+    counts = numpy.bincount(inverse, minlength=len(normals))
+    weighted = normals * counts[:, None]
+
+    selected = numpy.zeros(len(normals), numpy.bool_)
+    selected[inverse[faces]] = True
+
+    cells = numpy.floor(normals / tolerance).astype(numpy.int64)
+    buckets = {}
+    for index, cell in enumerate(map(tuple, cells.tolist())):
+        buckets.setdefault(cell, []).append(index)
+
+    min_cosine = math.cos(tolerance)
+    sums = numpy.zeros(normals.shape, numpy.float64)
+    matches = numpy.zeros(len(normals), numpy.float64)
+
+    for (x, y, z), members in buckets.items():
+        members = numpy.array(members)
+        members = members[selected[members]]
+        if not len(members):
+            continue
+
+        candidates = numpy.array(
+            [index
+             for neighbour in __get_neighbour_cells(x, y, z)
+             for index in buckets.get(neighbour, ())])
+
+        for start in range(0, len(members), chunk_size):
+            rows = members[start:start + chunk_size]
+            dots = numpy.dot(normals[rows], normals[candidates].T)
+            planar = dots > min_cosine
+            sums[rows] = numpy.dot(planar, weighted[candidates])
+            matches[rows] = numpy.dot(planar, counts[candidates])
+
+    result = (normals + sums) / (matches + 1)[:, None]
+    averaged[faces] = result[inverse[faces]]
+
+    return averaged
+
+
+def __get_neighbour_cells(x, y, z):
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                yield (x + dx, y + dy, z + dz)
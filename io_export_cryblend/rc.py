@@ -17,9 +17,10 @@
 if "bpy" in locals():
     import imp
     imp.reload(utils)
+    imp.reload(daewriter)
 else:
     import bpy
-    from io_export_cryblend import utils
+    from io_export_cryblend import utils, daewriter
 
 from io_export_cryblend.outpipe import cbPrint
 import fnmatch
@@ -40,25 +41,35 @@ class RCInstance:
         conversion_thread = threading.Thread(target=converter)
         conversion_thread.start()
 
-    def convert_dae(self, source):
-        converter = _DAEConverter(self.__config, source)
+    def convert_dae(self, source, changed=True, on_success=None):
+        converter = _DAEConverter(self.__config, source, changed, on_success)
         conversion_thread = threading.Thread(target=converter)
         conversion_thread.start()
 
 
 class _DAEConverter:
 
-    def __init__(self, config, source):
+    def __init__(self, config, source, changed=True, on_success=None):
         self.__config = config
         self.__doc = source
+        self.__changed = changed
+        self.__on_success = on_success
 
     def __call__(self):
         filepath = bpy.path.ensure_ext(self.__config.filepath, ".dae")
-        utils.generate_xml(filepath, self.__doc, overwrite=True)
+        changed = self.__changed
+        if self.__doc is not None:
+            changed = utils.generate_xml(
+                filepath, self.__doc, overwrite=True,
+                pretty=not self.__config.compact_dae,
+                only_if_changed=self.__config.deterministic_dae)
 
         dae_path = utils.get_absolute_path_for_rc(filepath)
+        succeeded = True
 
-        if not self.__config.disable_rc:
+        if not changed:
+            cbPrint("{} is unchanged, skipping RC.".format(filepath))
+        elif not self.__config.disable_rc:
             rc_params = ["/verbose", "/threads=processors", "/refresh"]
             if self.__config.do_materials:
                 rc_params.append("/createmtl=1")
@@ -66,7 +77,7 @@ class _DAEConverter:
             rc_process = run_rc(self.__config.rc_path, dae_path, rc_params)
 
             if rc_process is not None:
-                rc_process.wait()
+                succeeded = rc_process.wait() == 0
                 self.__recompile(dae_path)
 
             if self.__config.do_materials:
@@ -79,12 +90,20 @@ class _DAEConverter:
         if self.__config.make_layer:
             lyr_contents = self.__make_layer()
             lyr_path = os.path.splitext(filepath)[0] + ".lyr"
-            utils.generate_file(lyr_path, lyr_contents)
+            utils.generate_file(
+                lyr_path, lyr_contents,
+                only_if_changed=self.__config.deterministic_dae)
 
-        if not self.__config.save_dae:
+        # The next incremental export copies unchanged elements from the
+        # DAE file, so it is kept as if Save DAE File were on.
+        if not (self.__config.save_dae or self.__config.incremental_dae):
             rcdone_path = "{}.rcdone".format(dae_path)
             utils.remove_file(dae_path)
             utils.remove_file(rcdone_path)
+            utils.remove_file(daewriter.get_index_path(filepath))
+
+        if succeeded and self.__on_success is not None:
+            self.__on_success()
 
     def __recompile(self, dae_path):
         name = os.path.basename(dae_path)
@@ -151,6 +170,12 @@ class _DAEConverter:
         os.remove(mtl_file_name)
         os.rename(tmp_mtl_file_name, mtl_file_name)
 
+    def __get_guid(self, name):
+        if self.__config.deterministic_dae:
+            return utils.get_guid(name)
+
+        return utils.get_guid()
+
     def __make_layer(self):
         layer_doc = Document()
         object_layer = layer_doc.createElement("ObjectLayer")
@@ -158,7 +183,7 @@ class _DAEConverter:
         layer = createAttributes(
             'Layer',
             {'name': layer_name,
-             'GUID': utils.get_guid(),
+             'GUID': self.__get_guid(layer_name),
              'FullName': layer_name,
              'External': '0',
              'Exportable': '1',
@@ -183,7 +208,7 @@ class _DAEConverter:
                 'Object',
                 {'name': group.name[14:],
                  'Type': 'Entity',
-                 'Id': utils.get_guid(),
+                 'Id': self.__get_guid(group.name),
                  'LayerGUID': layer.getAttribute('GUID'),
                  'Layer': layer_name,
                  'Pos': "{}, {}, {}".format(origin[:]),
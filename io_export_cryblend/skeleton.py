@@ -0,0 +1,360 @@
+#------------------------------------------------------------------------------
+# Name:        skeleton.py
+# Purpose:     Joint data of armatures, computed for all bones at once
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+'''Joints sit at the rest position of their bone head with no rotation,
+which is where the exporter used to place its helper cubes. Posed, a
+joint moves with the head of its bone and turns by the bone's rotation
+from its rest orientation. All matrices are row-major and in armature
+space.
+'''
+
+
+from io_export_cryblend.meshdata import read_attribute
+import numpy
+
+
+ROTATION_PATHS = {
+    'QUATERNION': "rotation_quaternion",
+    'AXIS_ANGLE': "rotation_axis_angle",
+}
+AXES = "XYZ"
+
+# Below this cosine of the Y angle the X and Z axes line up.
+GIMBAL_LOCK = 1e-6
+
+
+def read_heads(armature):
+    '''Rest position of every bone head in armature space, in the order
+    of armature.data.bones.'''
+    bones = armature.data.bones
+    return read_attribute(bones, "head_local", 3).reshape(-1, 3)
+
+
+def read_parents(armature):
+    '''Index of the parent of every bone, or -1 for roots, in the order
+    of armature.pose.bones like the joints of sample_joint_matrices.'''
+    pose_bones = armature.pose.bones
+    indices = {pose_bone.name: index
+               for index, pose_bone in enumerate(pose_bones)}
+    return numpy.array([-1 if pose_bone.parent is None else
+                        indices[pose_bone.parent.name]
+                        for pose_bone in pose_bones], numpy.int64)
+
+
+def get_inverse_bind_matrices(heads):
+    '''Row-major 4x4 inverse bind matrix of every joint as one flat
+    array.'''
+    matrices = numpy.zeros((len(heads), 4, 4))
+    matrices[:, range(4), range(4)] = 1.0
+    matrices[:, :3, 3] = -heads
+
+    return matrices.ravel()
+
+
+def sample_joint_matrices(armature, frames, scene):
+    '''Matrix of every joint on every frame as a (frames, bones, 4, 4)
+    array, bones in the order of armature.pose.bones.
+
+    Bones are posed from the fcurves of the armature's action. Only bones
+    moved by constraints or drivers, or that do not fully inherit the
+    transform of their parent, are read from the scene with frame_set.
+    All bones are read that way if NLA tracks or the blending settings
+    of the action take part in the pose.
+    '''
+    pose_bones = armature.pose.bones
+    frames = list(frames)
+    indices = {pose_bone.name: index
+               for index, pose_bone in enumerate(pose_bones)}
+
+    rest = numpy.array([numpy.array(pose_bone.bone.matrix_local)
+                        for pose_bone in pose_bones]).reshape(-1, 4, 4)
+    rest_inverse = numpy.linalg.inv(rest)
+
+    evaluated = __read_evaluated_poses(
+        armature, __get_evaluated_bones(armature), frames, scene)
+    fcurves = __get_fcurves(armature)
+
+    poses = numpy.empty((len(frames), len(pose_bones), 4, 4))
+    for pose_bone in __get_hierarchy_order(pose_bones):
+        index = indices[pose_bone.name]
+        if pose_bone.name in evaluated:
+            poses[:, index] = evaluated[pose_bone.name]
+            continue
+
+        basis = __get_basis_matrices(pose_bone, fcurves, frames)
+        parent = pose_bone.parent
+        if parent is None:
+            poses[:, index] = __multiply(rest[index], basis)
+        else:
+            parent_index = indices[parent.name]
+            offset = numpy.dot(rest_inverse[parent_index], rest[index])
+            poses[:, index] = __multiply(
+                poses[:, parent_index], __multiply(offset, basis))
+
+    # The joint keeps the head of its bone but drops the rest rotation.
+    # Heads are read in pose bone order, which differs from the order of
+    # armature.data.bones once bones are added to an existing hierarchy.
+    heads = numpy.tile(numpy.identity(4), (len(pose_bones), 1, 1))
+    heads[:, :3, 3] = [tuple(pose_bone.bone.head_local)
+                       for pose_bone in pose_bones]
+
+    return __multiply(poses, __multiply(rest_inverse, heads))
+
+
+def solve_local_transforms(joints, parents):
+    '''Translations and XYZ Euler rotations of the joints on every frame
+    as two (frames, bones, 3) arrays. A joint is taken relative to the
+    joint at its index in parents, or left in armature space for -1.
+    Scale is dropped.
+    '''
+    parents = numpy.asarray(parents)
+    local = numpy.array(joints, numpy.float64)
+    children = numpy.flatnonzero(parents >= 0)
+    if len(children):
+        local[:, children] = __multiply(
+            numpy.linalg.inv(local[:, parents[children]]),
+            local[:, children])
+
+    translations = local[..., :3, 3]
+    rotations = local[..., :3, :3]
+    lengths = numpy.sqrt((rotations ** 2).sum(-2))[..., numpy.newaxis, :]
+    rotations = rotations / numpy.where(lengths > 0, lengths, 1.0)
+
+    # Whole turns between frames are removed, so keys interpolate along
+    # the shorter way.
+    return translations, numpy.unwrap(__matrix_eulers(rotations), axis=0)
+
+
+def euler_matrices(eulers, order):
+    '''Rotation matrices of an (n, 3) array of Euler angles, rotated about
+    the axes in the given order, e.g. 'XYZ' rotates about X first.'''
+    result = None
+    for axis in order:
+        index = AXES.index(axis)
+        angles = eulers[:, index]
+        cos, sin = numpy.cos(angles), numpy.sin(angles)
+        first, second = [other for other in range(3) if other != index]
+
+        matrices = numpy.zeros((len(angles), 3, 3))
+        matrices[:, index, index] = 1.0
+        matrices[:, first, first] = cos
+        matrices[:, second, second] = cos
+        # Y rotates Z into X, the other axes rotate the next axis onward.
+        sign = -1.0 if index == 1 else 1.0
+        matrices[:, first, second] = -sign * sin
+        matrices[:, second, first] = sign * sin
+
+        result = matrices if result is None else __multiply(matrices, result)
+
+    return result
+
+
+def __get_hierarchy_order(pose_bones):
+    '''Pose bones with every parent before its children.'''
+    order = []
+    stack = [pose_bone for pose_bone in pose_bones
+             if pose_bone.parent is None][::-1]
+    while stack:
+        pose_bone = stack.pop()
+        order.append(pose_bone)
+        stack.extend(reversed(pose_bone.children))
+
+    return order
+
+
+def __get_evaluated_bones(armature):
+    '''Names of the bones whose pose the fcurves alone do not give.'''
+    animation_data = armature.animation_data
+    if __is_blended(animation_data):
+        return {pose_bone.name for pose_bone in armature.pose.bones}
+
+    names = set()
+    if animation_data is not None:
+        for driver in animation_data.drivers:
+            if driver.data_path.startswith('pose.bones["'):
+                names.add(driver.data_path.split('"')[1])
+
+    for pose_bone in armature.pose.bones:
+        bone = pose_bone.bone
+        if not (bone.use_inherit_rotation and
+                getattr(bone, "use_inherit_scale", True) and
+                bone.use_local_location):
+            names.add(pose_bone.name)
+
+        for constraint in pose_bone.constraints:
+            if constraint.mute:
+                continue
+            names.add(pose_bone.name)
+            if constraint.type in ('IK', 'SPLINE_IK'):
+                # IK moves the bones up the chain as well.
+                chain = constraint.chain_count or len(armature.pose.bones)
+                parent = pose_bone.parent
+                while parent is not None and chain > 1:
+                    names.add(parent.name)
+                    parent = parent.parent
+                    chain -= 1
+
+    return names
+
+
+def __is_blended(animation_data):
+    '''True if the pose is not the action alone, as Blender blends NLA
+    tracks or the action with other than the default settings.'''
+    if animation_data is None:
+        return False
+
+    return (animation_data.use_tweak_mode or
+            animation_data.action_influence != 1.0 or
+            animation_data.action_blend_type != 'REPLACE' or
+            animation_data.action_extrapolation != 'HOLD' or
+            any(not track.mute for track in animation_data.nla_tracks))
+
+
+def __read_evaluated_poses(armature, names, frames, scene):
+    '''Pose matrices of the named bones for every frame, read after
+    scene.frame_set in pose position. The current frame and the pose
+    position are restored afterwards.'''
+    if not names:
+        return {}
+
+    poses = {name: numpy.empty((len(frames), 4, 4)) for name in names}
+    current = scene.frame_current
+    pose_position = armature.data.pose_position
+    armature.data.pose_position = 'POSE'
+    try:
+        pose_bones = armature.pose.bones
+        for index, frame in enumerate(frames):
+            scene.frame_set(frame)
+            for name, matrices in poses.items():
+                matrices[index] = numpy.array(pose_bones[name].matrix)
+    finally:
+        armature.data.pose_position = pose_position
+        scene.frame_set(current)
+
+    return poses
+
+
+def __get_fcurves(armature):
+    '''Unmuted fcurves of the armature's action by (data path, index).'''
+    animation_data = armature.animation_data
+    if animation_data is None or animation_data.action is None:
+        return {}
+
+    return {(fcurve.data_path, fcurve.array_index): fcurve
+            for fcurve in animation_data.action.fcurves if not fcurve.mute}
+
+
+def __get_basis_matrices(pose_bone, fcurves, frames):
+    '''Location, rotation and scale of a pose bone on every frame as a
+    (frames, 4, 4) array of matrices.'''
+    location = __sample_channel(pose_bone, "location", fcurves, frames)
+    if pose_bone.bone.use_connect:
+        # Blender ignores the location of connected bones.
+        location[:] = 0.0
+    scale = __sample_channel(pose_bone, "scale", fcurves, frames)
+
+    mode = pose_bone.rotation_mode
+    path = ROTATION_PATHS.get(mode, "rotation_euler")
+    rotation = __sample_channel(pose_bone, path, fcurves, frames)
+    if mode == 'QUATERNION':
+        rotation = __quaternion_matrices(rotation)
+    elif mode == 'AXIS_ANGLE':
+        rotation = __axis_angle_matrices(rotation)
+    else:
+        rotation = euler_matrices(rotation, mode)
+
+    basis = numpy.zeros((len(frames), 4, 4))
+    basis[:, :3, :3] = rotation * scale[:, numpy.newaxis, :]
+    basis[:, :3, 3] = location
+    basis[:, 3, 3] = 1.0
+
+    return basis
+
+
+def __sample_channel(pose_bone, attribute, fcurves, frames):
+    '''Values of a pose bone property on every frame. Components without
+    an fcurve keep their current value.'''
+    path = 'pose.bones["{}"].{}'.format(pose_bone.name, attribute)
+    default = tuple(getattr(pose_bone, attribute))
+    values = numpy.tile(numpy.array(default, numpy.float64),
+                        (len(frames), 1))
+    for index in range(len(default)):
+        fcurve = fcurves.get((path, index))
+        if fcurve is not None:
+            values[:, index] = [fcurve.evaluate(frame) for frame in frames]
+
+    return values
+
+
+def __quaternion_matrices(quaternions):
+    '''Rotation matrices of (w, x, y, z) quaternions.'''
+    lengths = numpy.sqrt((quaternions ** 2).sum(1))
+    w, x, y, z = (quaternions / numpy.where(
+        lengths > 0, lengths, 1.0)[:, numpy.newaxis]).T
+
+    matrices = numpy.empty((len(quaternions), 3, 3))
+    matrices[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    matrices[:, 0, 1] = 2 * (x * y - w * z)
+    matrices[:, 0, 2] = 2 * (x * z + w * y)
+    matrices[:, 1, 0] = 2 * (x * y + w * z)
+    matrices[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    matrices[:, 1, 2] = 2 * (y * z - w * x)
+    matrices[:, 2, 0] = 2 * (x * z - w * y)
+    matrices[:, 2, 1] = 2 * (y * z + w * x)
+    matrices[:, 2, 2] = 1 - 2 * (x * x + y * y)
+
+    return matrices
+
+
+def __axis_angle_matrices(axis_angles):
+    '''Rotation matrices of (angle, x, y, z) axis angles.'''
+    angles = axis_angles[:, 0]
+    axes = axis_angles[:, 1:]
+    lengths = numpy.sqrt((axes ** 2).sum(1))
+    axes = axes / numpy.where(lengths > 0, lengths, 1.0)[:, numpy.newaxis]
+
+    quaternions = numpy.empty((len(angles), 4))
+    quaternions[:, 0] = numpy.cos(angles / 2)
+    quaternions[:, 1:] = axes * numpy.sin(angles / 2)[:, numpy.newaxis]
+
+    return __quaternion_matrices(quaternions)
+
+
+def __matrix_eulers(matrices):
+    '''XYZ Euler angles of rotation matrices, chosen like to_euler of
+    mathutils from the two that give the same rotation.'''
+    cos_y = numpy.hypot(matrices[..., 0, 0], matrices[..., 1, 0])
+    locked = cos_y < GIMBAL_LOCK
+
+    first = numpy.empty(matrices.shape[:-1])
+    first[..., 0] = numpy.where(
+        locked, numpy.arctan2(-matrices[..., 1, 2], matrices[..., 1, 1]),
+        numpy.arctan2(matrices[..., 2, 1], matrices[..., 2, 2]))
+    first[..., 1] = numpy.arctan2(-matrices[..., 2, 0], cos_y)
+    first[..., 2] = numpy.where(
+        locked, 0.0, numpy.arctan2(matrices[..., 1, 0], matrices[..., 0, 0]))
+
+    second = numpy.empty(matrices.shape[:-1])
+    second[..., 0] = numpy.arctan2(-matrices[..., 2, 1], -matrices[..., 2, 2])
+    second[..., 1] = numpy.arctan2(-matrices[..., 2, 0], -cos_y)
+    second[..., 2] = numpy.arctan2(-matrices[..., 1, 0], -matrices[..., 0, 0])
+
+    use_second = ~locked & (numpy.abs(second).sum(-1) <
+                            numpy.abs(first).sum(-1))
+
+    return numpy.where(use_second[..., numpy.newaxis], second, first)
+
+
+def __multiply(a, b):
+    '''Matrix product of two matrices or stacks of matrices.'''
+    return numpy.einsum('...ij,...jk->...ik', a, b)
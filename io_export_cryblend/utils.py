@@ -23,33 +23,34 @@ else:
 
 
 from io_export_cryblend.outpipe import cbPrint
-from mathutils import Matrix, Vector
-from xml.dom.minidom import Document, parseString
+from collections import OrderedDict
+from mathutils import Vector
+from xml.dom.minidom import parseString
 import bpy
-import fnmatch
+import filecmp
 import math
 import os
 import random
 import re
-import subprocess
 import sys
-import xml.dom.minidom
-import time
+import uuid
 
 
 # Globals:
 to_degrees = 180.0 / math.pi
+# Scene property with the export state of every node, see dirty.py.
+DIRTY_NODES = "cryblend_dirty_nodes"
 
 
 #------------------------------------------------------------------------------
 # Conversions:
 #------------------------------------------------------------------------------
 
-def color_to_string(color, a):
+def color_to_rgba(color, a):
     if type(color) in (float, int):
-        return "{:f} {:f} {:f} {:f}".format(color, color, color, a)
+        return (color, color, color, a)
     elif type(color).__name__ == "Color":
-        return "{:f} {:f} {:f} {:f}".format(color.r, color.g, color.b, a)
+        return (color.r, color.g, color.b, a)
 
 
 def frame_to_time(frame):
@@ -58,33 +59,6 @@ def frame_to_time(frame):
     return fps_base * frame / fps
 
 
-def matrix_to_string(matrix):
-    return str(matrix_to_array(matrix))
-
-
-def floats_to_string(floats, separator=" ", precision="%.6f"):
-    return separator.join(precision % x for x in floats)
-
-
-def strings_to_string(strings, separator=" "):
-    return separator.join(string for string in strings)
-
-
-def matrix_to_array(matrix):
-    array = []
-    for row in matrix:
-        array.extend(row)
-
-    return array
-
-
-def write_matrix(matrix, node):
-    doc = Document()
-    for row in matrix:
-        row_string = floats_to_string(row)
-        node.appendChild(doc.createTextNode(row_string))
-
-
 def join(*items):
     strings = []
     for item in items:
@@ -92,15 +66,6 @@ def join(*items):
     return "".join(strings)
 
 
-#------------------------------------------------------------------------------
-# Matrix Manipulations:
-#------------------------------------------------------------------------------
-
-def negate_z_axis_of_matrix(matrix_local):
-    for i in range(0, 3):
-        matrix_local[i][3] = -matrix_local[i][3]
-
-
 #------------------------------------------------------------------------------
 # Path Manipulations:
 #------------------------------------------------------------------------------
@@ -318,19 +283,30 @@ def apply_modifiers():
 # Collections:
 #------------------------------------------------------------------------------
 
-def get_export_nodes(just_selected=False):
+def get_export_nodes(just_selected=False, just_dirty=False):
     export_nodes = []
 
     if just_selected:
-        return __get_selected_nodes()
+        export_nodes = __get_selected_nodes()
+    else:
+        for group in bpy.data.groups:
+            if is_export_node(group) and len(group.objects) > 0:
+                export_nodes.append(group)
 
-    for group in bpy.data.groups:
-        if is_export_node(group) and len(group.objects) > 0:
-            export_nodes.append(group)
+    if just_dirty:
+        export_nodes = [group for group in export_nodes
+                        if is_dirty_node(group)]
 
     return export_nodes
 
 
+def is_dirty_node(group):
+    '''True if the node changed since its last export, or was never
+    exported.'''
+    states = bpy.context.scene.get(DIRTY_NODES)
+    return states is None or states.get(group.name, 1) != 0
+
+
 def __get_selected_nodes():
     export_nodes = []
 
@@ -355,7 +331,13 @@ def get_type(type_):
         "textures": __get_textures,
         "texture_nodes": __get_texture_nodes_for_cycles
     }
-    return list(set(dispatch[type_]()))
+    return unique(dispatch[type_]())
+
+
+def unique(items):
+    '''Remove duplicates and keep the first occurrence, so the export order
+    stays the same from one run to the next.'''
+    return list(OrderedDict.fromkeys(items))
 
 
 def __get_objects():
@@ -563,8 +545,7 @@ def get_material_color(material, type_):
     elif type_ == "specular":
         color = material.specular_color
 
-    col = color_to_string(color, alpha)
-    return col
+    return color_to_rgba(color, alpha)
 
 
 def get_material_attribute(material, type_):
@@ -573,7 +554,7 @@ def get_material_attribute(material, type_):
     elif type_ == "index_refraction":
         float = material.alpha
 
-    return str(float)
+    return float
 
 
 def get_material_parts(node, material):
@@ -687,11 +668,6 @@ def get_armature_node_name(object_):
 # Fakebones:
 #------------------------------------------------------------------------------
 
-def get_fakebone(bone_name):
-    return next((fakebone for fakebone in get_type("fakebones")
-                 if fakebone.name == bone_name), None)
-
-
 def is_fakebone(object_):
     if object_.get("fakebone") is not None:
         return True
@@ -699,40 +675,6 @@ def is_fakebone(object_):
         return False
 
 
-def add_fakebones():
-    '''Add helpers to track bone transforms.'''
-    scene = bpy.context.scene
-    remove_unused_meshes()
-    armature = get_armature()
-    if armature is None:
-        return
-
-    skeleton = armature.data
-
-    skeleton.pose_position = 'REST'
-    time.sleep(0.5)
-
-    deselect_all()
-    scene.frame_set(scene.frame_start)
-    for pose_bone in armature.pose.bones:
-        bmatrix = pose_bone.bone.head_local
-        bpy.ops.mesh.primitive_cube_add(radius=.01, location=bmatrix)
-        fakebone = bpy.context.active_object
-        fakebone.name = pose_bone.name
-        fakebone["fakebone"] = "fakebone"
-        scene.objects.active = armature
-        armature.data.bones.active = pose_bone.bone
-        bpy.ops.object.parent_set(type='BONE_RELATIVE')
-
-    ALLOWED_NODE_TYPES = ("cga", "anm", "i_caf")
-
-    for group in armature.users_group:
-        node_type = get_node_type(group)
-
-        if node_type in ALLOWED_NODE_TYPES:
-            process_animation(armature, skeleton)
-
-
 def remove_fakebones():
     '''Select to remove all fakebones from the scene.'''
     if len(get_type("fakebones")) == 0:
@@ -752,89 +694,6 @@ def remove_fakebones():
 # Animation and Keyframing:
 #------------------------------------------------------------------------------
 
-def process_animation(armature, skeleton):
-    '''Process animation to export.'''
-    skeleton.pose_position = 'POSE'
-    time.sleep(0.5)
-
-    select_all()
-
-    location_list, rotation_list = get_keyframes(armature)
-    set_keyframes(armature, location_list, rotation_list)
-    cbPrint("Animation was processed.")
-
-
-def get_keyframes(armature):
-    '''Get each bone location and rotation for each frame.'''
-    location_list = []
-    rotation_list = []
-
-    for frame in range(
-            bpy.context.scene.frame_start,
-            bpy.context.scene.frame_end + 1):
-        bpy.context.scene.frame_set(frame)
-
-        locations = {}
-        rotations = {}
-
-        for bone in armature.pose.bones:
-            fakeBone = bpy.data.objects[bone.name]
-
-            if bone.parent and bone.parent.parent:
-                parentMatrix = bpy.data.objects[
-                    bone.parent.name].matrix_world
-
-                animatrix = parentMatrix.inverted() * fakeBone.matrix_world
-                lm, rm, sm = animatrix.decompose()
-                locations[bone.name] = lm
-                rotations[bone.name] = rm.to_euler()
-
-            else:
-                lm, rm, sm = fakeBone.matrix_world.decompose()
-                locations[bone.name] = lm
-                rotations[bone.name] = rm.to_euler()
-
-        location_list.append(locations.copy())
-        rotation_list.append(rotations.copy())
-
-        del locations
-        del rotations
-
-    cbPrint("Keyframes were appended to lists.")
-
-    return location_list, rotation_list
-
-
-def set_keyframes(armature, location_list, rotation_list):
-    '''Insert each keyframe from lists.'''
-
-    bpy.context.scene.frame_set(bpy.context.scene.frame_start)
-
-    for frame in range(
-            bpy.context.scene.frame_start,
-            bpy.context.scene.frame_end + 1):
-        set_keyframe(armature, frame, location_list, rotation_list)
-
-    bpy.context.scene.frame_set(bpy.context.scene.frame_start)
-    cbPrint("Keyframes were inserted to armature fakebones.")
-
-
-def set_keyframe(armature, frame, location_list, rotation_list):
-    '''Inset keyframe for current frame from lists.'''
-    bpy.context.scene.frame_set(frame)
-
-    for bone in armature.pose.bones:
-        index = frame - bpy.context.scene.frame_start
-
-        fakeBone = bpy.data.objects[bone.name]
-
-        fakeBone.location = location_list[index][bone.name]
-        fakeBone.rotation_euler = rotation_list[index][bone.name]
-
-        fakeBone.keyframe_insert(data_path="location")
-        fakeBone.keyframe_insert(data_path="rotation_euler")
-
-
 def apply_animation_scale(armature):
     '''Apply Animation Scale.'''
     scene = bpy.context.scene
@@ -1067,12 +926,15 @@ def get_3d_context(object_):
 # Layer File:
 #------------------------------------------------------------------------------
 
-def get_guid():
-    GUID = "{{}-{}-{}-{}-{}}".format(random_hex_sector(8),
-                                     random_hex_sector(4),
-                                     random_hex_sector(4),
-                                     random_hex_sector(4),
-                                     random_hex_sector(12))
+def get_guid(name=None):
+    if name is not None:
+        return "{{{}}}".format(uuid.uuid5(uuid.NAMESPACE_OID, name))
+
+    GUID = "{{{}-{}-{}-{}-{}}}".format(random_hex_sector(8),
+                                       random_hex_sector(4),
+                                       random_hex_sector(4),
+                                       random_hex_sector(4),
+                                       random_hex_sector(12))
     return GUID
 
 
@@ -1104,91 +966,53 @@ def generate_file_contents(type_):
 </CharacterDefinition>"""
 
 
-def generate_file(filepath, contents, overwrite=False):
+def generate_file(filepath, contents, overwrite=False,
+                  only_if_changed=False):
     if not os.path.exists(filepath) or overwrite:
+        if only_if_changed and os.path.exists(filepath):
+            file = open(filepath, 'r')
+            unchanged = file.read() == contents
+            file.close()
+            if unchanged:
+                return False
+
         file = open(filepath, 'w')
         file.write(contents)
         file.close()
+        return True
+
+    return False
 
 
-def generate_xml(filepath, contents, overwrite=False):
+def generate_xml(filepath, contents, overwrite=False, pretty=True,
+                 only_if_changed=False):
     if not os.path.exists(filepath) or overwrite:
         if isinstance(contents, str):
             script = parseString(contents)
         else:
             script = contents
-        contents = script.toprettyxml(indent="    ")
-        generate_file(filepath, contents, overwrite)
-
+        if pretty:
+            contents = script.toprettyxml(indent="    ")
+        else:
+            contents = script.toxml()
+        return generate_file(filepath, contents, overwrite, only_if_changed)
 
-def remove_file(filepath):
-    if os.path.exists(filepath):
-        os.remove(filepath)
+    return False
 
 
-#------------------------------------------------------------------------------
-# Collada:
-#------------------------------------------------------------------------------
+def replace_file(source_path, filepath, only_if_changed=False):
+    if only_if_changed and os.path.exists(filepath) and \
+            filecmp.cmp(source_path, filepath, shallow=False):
+        os.remove(source_path)
+        return False
 
-def write_source(id_, type_, array, params):
-    doc = Document()
-    length = len(array)
-    if type_ == "float4x4":
-        stride = 16
-    elif len(params) == 0:
-        stride = 1
-    else:
-        stride = len(params)
-    count = int(length / stride)
+    os.replace(source_path, filepath)
+    return True
 
-    source = doc.createElement("source")
-    source.setAttribute("id", id_)
 
-    if type_ == "float4x4":
-        source_data = doc.createElement("float_array")
-    else:
-        source_data = doc.createElement("{!s}_array".format(type_))
-    source_data.setAttribute("id", "{!s}-array".format(id_))
-    source_data.setAttribute("count", str(length))
-    try:
-        source_data.appendChild(doc.createTextNode(floats_to_string(array)))
-    except TypeError:
-        source_data.appendChild(doc.createTextNode(strings_to_string(array)))
-    technique_common = doc.createElement("technique_common")
-    accessor = doc.createElement("accessor")
-    accessor.setAttribute("source", "#{!s}-array".format(id_))
-    accessor.setAttribute("count", str(count))
-    accessor.setAttribute("stride", str(stride))
-    for param in params:
-        param_node = doc.createElement("param")
-        param_node.setAttribute("name", param)
-        param_node.setAttribute("type", type_)
-        accessor.appendChild(param_node)
-    if len(params) == 0:
-        param_node = doc.createElement("param")
-        param_node.setAttribute("type", type_)
-        accessor.appendChild(param_node)
-    technique_common.appendChild(accessor)
-
-    source.appendChild(source_data)
-    source.appendChild(technique_common)
-
-    return source
-
-
-def write_input(name, offset, type_, semantic):
-    doc = Document()
-    id_ = "{!s}-{!s}".format(name, type_)
-    input = doc.createElement("input")
-
-    if offset is not None:
-        input.setAttribute("offset", str(offset))
-    input.setAttribute("semantic", semantic)
-    if semantic == "TEXCOORD":
-        input.setAttribute("set", "0")
-    input.setAttribute("source", "#{!s}".format(id_))
-
-    return input
+def remove_file(filepath):
+    if os.path.exists(filepath):
+        os.remove(filepath)
 
 
 # this is needed if you want to access more than the first def
@@ -0,0 +1,277 @@
+#------------------------------------------------------------------------------
+# Name:        workers.py
+# Purpose:     Worker processes for the serialization of library elements
+#
+# Author:      CryBlend contributors
+#
+# Created:     17/10/2026
+# Copyright:   (c) CryBlend contributors 2026
+# License:     GPLv2+
+#------------------------------------------------------------------------------
+
+# <pep8-80 compliant>
+
+'''Workers are forked from Blender where it can fork, so they start with
+the add-on already imported and only receive the ir.py records of their
+jobs. Elsewhere they are spawned, and importing the add-on would run its
+__init__, which needs bpy. A spawned worker registers the package as an
+empty module on its directory instead, so the modules its jobs use
+(elements, ir, meshdata, daewriter, formatting and what they import)
+load on their own. Those must not import bpy.
+
+Large arrays in those records are handed over in shared memory blocks
+by SharedArrays, so workers read them where they are instead of
+receiving a pickled copy.
+'''
+
+
+from io_export_cryblend import daewriter
+from io_export_cryblend.outpipe import cbPrint
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import copy
+import mmap
+import multiprocessing
+import numpy
+import os
+import shutil
+import tempfile
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python before 3.8, memory mapped files are used instead.
+    shared_memory = None
+
+
+# Smaller arrays are cheaper to pickle than to map.
+MIN_SHARED_SIZE = 65536
+# Jobs submitted per worker before the oldest one is waited for, which
+# keeps the next job queued without holding the arrays of all of them.
+JOBS_PER_WORKER = 2
+
+# Run by exec in a spawned worker before it unpickles its first job.
+__BOOTSTRAP = """
+import sys, types
+if name not in sys.modules:
+    package = types.ModuleType(name)
+    package.__path__ = [path]
+    sys.modules[name] = package
+"""
+
+
+def create_pool(workers=0, executable=None):
+    '''Pool of workers processes, one per core if 0, or None if there is
+    no way to start them here. executable is the Python interpreter for
+    spawned workers, if it is not sys.executable.'''
+    workers = get_worker_count(workers)
+    if "fork" in multiprocessing.get_all_start_methods():
+        try:
+            return ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("fork"))
+        except TypeError:
+            # Before Python 3.7 the pool uses the default start method,
+            # which is fork wherever fork exists.
+            return ProcessPoolExecutor(workers)
+
+    context = multiprocessing.get_context("spawn")
+    if executable:
+        context.set_executable(executable)
+    bootstrap = {"name": __package__, "path": os.path.dirname(__file__)}
+    try:
+        return ProcessPoolExecutor(
+            workers, mp_context=context, initializer=exec,
+            initargs=(__BOOTSTRAP, bootstrap))
+    except TypeError:
+        # Spawned workers need an initializer, added in Python 3.7.
+        cbPrint("Parallel export needs fork or Python 3.7, exporting "
+                "serially.", 'warning')
+        return None
+
+
+def get_worker_count(workers=0):
+    return workers or os.cpu_count() or 1
+
+
+def get_config(config):
+    '''Copy of the export config that can be sent to the workers.'''
+    return SimpleNamespace(**vars(config))
+
+
+def write_fragment(function, args, pretty):
+    '''Run in a worker: the text of the element made by function(*args).
+    Arrays shared by SharedArrays are mapped during the call.'''
+    with AttachedArrays(args) as args:
+        element = function(*args)
+        fragment = daewriter.to_fragment(element, pretty)
+        # Drop the views of the shared arrays before the blocks close.
+        element.unlink()
+        del element, args
+
+    return fragment
+
+
+def map_arrays(value, function, types=(numpy.ndarray,)):
+    '''Copy of value with every array in it, an instance of types,
+    replaced by function(array). Tuples, lists and dicts are searched, and
+    objects of the add-on (ir.py records, MeshBuffers) have their
+    attributes replaced in a shallow copy.'''
+    if isinstance(value, types):
+        return function(value)
+    if isinstance(value, (tuple, list)):
+        return type(value)(
+            map_arrays(item, function, types) for item in value)
+    if isinstance(value, dict):
+        return {key: map_arrays(item, function, types)
+                for key, item in value.items()}
+    if not type(value).__module__.startswith(__package__):
+        return value
+
+    result = copy.copy(value)
+    if hasattr(value, "__dict__"):
+        for name, item in vars(value).items():
+            setattr(result, name, map_arrays(item, function, types))
+    for name in getattr(type(value), "__slots__", ()):
+        if hasattr(value, name):
+            setattr(result, name,
+                    map_arrays(getattr(value, name), function, types))
+
+    return result
+
+
+class SharedBlock:
+    '''Block of memory other processes can open by its name. It is a
+    multiprocessing.shared_memory block, or a memory mapped file in a
+    temporary directory on Python before 3.8.
+    '''
+
+    def __init__(self, name=None, size=0, directory=None):
+        create = name is None
+        if shared_memory is not None:
+            self.__memory = shared_memory.SharedMemory(name, create, size)
+            self.name = self.__memory.name
+            self.buffer = self.__memory.buf
+            return
+
+        if create:
+            descriptor, name = tempfile.mkstemp(dir=directory)
+            os.ftruncate(descriptor, size)
+        else:
+            descriptor = os.open(name, os.O_RDWR)
+        try:
+            self.__memory = mmap.mmap(descriptor, 0)
+        finally:
+            os.close(descriptor)
+        self.name = name
+        self.buffer = self.__memory
+
+    def close(self):
+        self.buffer = None
+        try:
+            self.__memory.close()
+        except BufferError:
+            # Arrays still use the block, it is unmapped once they are
+            # collected.
+            pass
+
+    def unlink(self):
+        if shared_memory is not None:
+            self.__memory.unlink()
+        else:
+            os.remove(self.name)
+
+
+class SharedArray:
+    '''Picklable reference to an array in a SharedBlock.'''
+    __slots__ = ("name", "dtype", "shape")
+
+    def __init__(self, name, dtype, shape):
+        self.name = name
+        self.dtype = dtype
+        self.shape = shape
+
+    def open(self, blocks):
+        '''View of the array. Its block is added to blocks, which must be
+        closed once the view is no longer used.'''
+        block = SharedBlock(self.name)
+        blocks.append(block)
+        return numpy.ndarray(self.shape, self.dtype, block.buffer)
+
+
+class SharedArrays:
+    '''Owner of the blocks holding the arrays handed to other processes.
+    As a context manager it closes and unlinks every block left on exit,
+    after an error or a cancelled export as well.
+    '''
+
+    def __init__(self, min_size=MIN_SHARED_SIZE):
+        self.__min_size = min_size
+        self.__blocks = {}
+        self.__directory = None
+        if shared_memory is None:
+            shm = "/dev/shm"
+            self.__directory = tempfile.mkdtemp(
+                prefix="cryblend_", dir=shm if os.path.isdir(shm) else None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.close()
+
+    def share(self, value):
+        '''Copy of value for another process with the arrays in shared
+        blocks, and the names of those blocks for release.'''
+        names = []
+
+        def share_array(array):
+            if not array.nbytes or array.nbytes < self.__min_size or \
+                    array.dtype.hasobject:
+                return array
+
+            block = SharedBlock(size=array.nbytes,
+                                directory=self.__directory)
+            self.__blocks[block.name] = block
+            names.append(block.name)
+            view = numpy.ndarray(array.shape, array.dtype, block.buffer)
+            view[...] = array
+            del view
+
+            return SharedArray(block.name, array.dtype.str, array.shape)
+
+        return map_arrays(value, share_array), names
+
+    def release(self, names):
+        '''Free the blocks of a finished job.'''
+        for name in names:
+            block = self.__blocks.pop(name, None)
+            if block is not None:
+                block.close()
+                block.unlink()
+
+    def close(self):
+        self.release(list(self.__blocks))
+        if self.__directory is not None:
+            shutil.rmtree(self.__directory, ignore_errors=True)
+            self.__directory = None
+
+
+class AttachedArrays:
+    '''Context manager giving a copy of a value made by SharedArrays.share
+    with views of its shared arrays, whose blocks are closed on exit.
+    '''
+
+    def __init__(self, value):
+        self.__value = value
+        self.__blocks = []
+
+    def __enter__(self):
+        return map_arrays(self.__value, self.__open, (SharedArray,))
+
+    def __exit__(self, type_, value, traceback):
+        for block in self.__blocks:
+            block.close()
+        self.__blocks = []
+
+    def __open(self, shared):
+        return shared.open(self.__blocks)